@@ -6,51 +6,154 @@ the system's various components including Daytona, Redis, LLM, and database.
 """
 
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 import asyncio
-from datetime import datetime
+import functools
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 
 from utils.logger import logger
-from sandbox.daytona_health import get_daytona_health_checker
-from sandbox.daytona_circuit_breaker import get_daytona_circuit_breaker
-from services.redis_circuit_breaker import get_circuit_breaker as get_redis_circuit_breaker
-from services.llm_retry_manager import get_retry_manager as get_llm_retry_manager
-import services.redis as redis_service
 from services.supabase import DBConnection
 
 router = APIRouter(tags=["health"])
 
+db: Optional[DBConnection] = None
+
+_cached_timestamp: Tuple[float, str] = (0.0, "")
+
+
+def initialize(_db: DBConnection):
+    """Initialize the health API with resources from the main API."""
+    global db
+    db = _db
+
+
+def utcnow_iso() -> str:
+    """Current UTC time as an ISO-8601 string."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def cached_utcnow_iso(max_age: float = 1.0) -> str:
+    """ISO timestamp reused for up to ``max_age`` seconds, for high-frequency liveness probes."""
+    global _cached_timestamp
+    now = time.monotonic()
+    if now - _cached_timestamp[0] >= max_age:
+        _cached_timestamp = (now, utcnow_iso())
+    return _cached_timestamp[1]
+
+
+def health_endpoint(
+    timeout: float = 5.0,
+    name: str = "",
+    status_code: int = 500,
+    error_detail: Optional[str] = None,
+):
+    """
+    Wrap a health endpoint with a timeout and uniform error handling.
+    
+    Timeouts surface as 504; any other failure is logged and raised as an
+    HTTPException with ``status_code`` and a ``{"status", "error"}`` detail.
+    Pass ``error_detail`` to return that fixed detail instead of the exception
+    text, for endpoints that must not expose internal errors.
+    HTTPExceptions raised by the endpoint itself pass through unchanged.
+    """
+    def decorator(fn):
+        label = name or fn.__name__
+        
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await asyncio.wait_for(fn(*args, **kwargs), timeout=timeout)
+            except HTTPException:
+                raise
+            except asyncio.TimeoutError:
+                logger.warning(f"{label} timed out after {timeout}s")
+                raise HTTPException(
+                    status_code=504,
+                    detail={
+                        "status": "timeout",
+                        "error": f"{label} timed out"
+                    }
+                )
+            except Exception as e:
+                if error_detail is not None:
+                    logger.error(f"{label} failed: {e}", exc_info=True)
+                    raise HTTPException(status_code=status_code, detail=error_detail)
+                logger.error(f"{label} failed: {e}")
+                raise HTTPException(
+                    status_code=status_code,
+                    detail={
+                        "status": "error",
+                        "error": str(e)
+                    }
+                )
+        
+        return wrapper
+    return decorator
+
 
 @router.get("/status")
 async def health_check() -> Dict[str, Any]:
     """Basic health check endpoint."""
     return {
         "status": "ok",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": cached_utcnow_iso(),
         "service": "kortix-backend"
     }
 
 
-@router.get("/detailed")
-async def detailed_health_check() -> Dict[str, Any]:
-    """
-    Comprehensive health check for all system components.
+_STATUS_SEVERITY = {"healthy": 0, "degraded": 1, "unhealthy": 2}
+
+
+@dataclass(slots=True)
+class ComponentHealth:
+    """Health of a single component; unset fields are omitted from the payload."""
+    status: str
+    response_time_ms: Optional[float] = None
+    is_healthy: Optional[bool] = None
+    connected: Optional[bool] = None
+    error: Optional[str] = None
+    consecutive_failures: Optional[int] = None
+    circuit_breaker: Optional[Dict[str, Any]] = None
+    metrics: Optional[Dict[str, Any]] = None
     
-    Returns detailed status of:
-    - Daytona sandbox service
-    - Redis cache and pub/sub
-    - LLM service providers
-    - Database connectivity
-    - Circuit breakers state
-    """
-    health_status = {
-        "overall": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "components": {},
-        "metrics": {}
-    }
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            name: value
+            for name in self.__slots__
+            if (value := getattr(self, name)) is not None
+        }
+
+
+@dataclass(slots=True)
+class DetailedHealth:
+    """Aggregated result of all component probes."""
+    timestamp: str
+    overall: str = "healthy"
+    components: Dict[str, ComponentHealth] = field(default_factory=dict)
+    warning: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            "overall": self.overall,
+            "timestamp": self.timestamp,
+            "components": {
+                name: component.to_dict()
+                for name, component in self.components.items()
+            },
+            "metrics": {}
+        }
+        if self.warning is not None:
+            result["warning"] = self.warning
+        return result
+
+
+async def _check_daytona() -> Tuple[str, ComponentHealth, str]:
+    """Probe Daytona and its circuit breaker."""
+    from sandbox.daytona_health import get_daytona_health_checker
+    from sandbox.daytona_circuit_breaker import get_daytona_circuit_breaker
     
-    # Check Daytona service (with timeout to prevent blocking)
     try:
         daytona_checker = get_daytona_health_checker()
         daytona_report = await asyncio.wait_for(
@@ -58,43 +161,40 @@ async def detailed_health_check() -> Dict[str, Any]:
             timeout=2.0  # Short timeout to prevent blocking
         )
         
-        health_status["components"]["daytona"] = {
-            "status": daytona_report.status.value,
-            "response_time_ms": daytona_report.response_time_ms,
-            "is_healthy": daytona_report.is_healthy(),
-            "error": daytona_report.error_message,
-            "consecutive_failures": daytona_report.consecutive_failures
-        }
-        
         # Get Daytona circuit breaker status
         daytona_cb = get_daytona_circuit_breaker()
-        health_status["components"]["daytona"]["circuit_breaker"] = daytona_cb.get_metrics()
         
-        if not daytona_report.is_healthy():
-            health_status["overall"] = "degraded"
+        component = ComponentHealth(
+            status=daytona_report.status.value,
+            response_time_ms=daytona_report.response_time_ms,
+            is_healthy=daytona_report.is_healthy(),
+            error=daytona_report.error_message,
+            consecutive_failures=daytona_report.consecutive_failures,
+            circuit_breaker=daytona_cb.get_metrics()
+        )
+        
+        return "daytona", component, "healthy" if daytona_report.is_healthy() else "degraded"
     
     except asyncio.TimeoutError:
         logger.warning("Daytona health check timed out")
-        health_status["components"]["daytona"] = {
-            "status": "timeout",
-            "error": "Health check timed out"
-        }
         # Don't mark overall as unhealthy for Daytona timeout
+        return "daytona", ComponentHealth(status="timeout", error="Health check timed out"), "healthy"
     except Exception as e:
         logger.error(f"Failed to check Daytona health: {e}")
-        health_status["components"]["daytona"] = {
-            "status": "error",
-            "error": str(e)
-        }
-        health_status["overall"] = "unhealthy"
+        return "daytona", ComponentHealth(status="error", error=str(e)), "unhealthy"
+
+
+async def _check_redis() -> Tuple[str, ComponentHealth, str]:
+    """Ping Redis and report its circuit breaker state."""
+    import services.redis as redis_service
+    from services.redis_circuit_breaker import get_circuit_breaker as get_redis_circuit_breaker
     
-    # Check Redis
     try:
         # Ping Redis to check connectivity
         redis_healthy = False
         try:
-            await redis_service.get_client()
-            await redis_service.client.ping()
+            redis_client = await redis_service.get_client()
+            await redis_client.ping()
             redis_healthy = True
         except:
             redis_healthy = False
@@ -102,200 +202,223 @@ async def detailed_health_check() -> Dict[str, Any]:
         redis_cb = get_redis_circuit_breaker()
         redis_cb_status = await redis_cb.get_health_status()
         
-        health_status["components"]["redis"] = {
-            "status": "healthy" if redis_healthy else "unhealthy",
-            "circuit_breaker": redis_cb_status
-        }
-        
-        if not redis_healthy:
-            health_status["overall"] = "degraded"
+        component = ComponentHealth(
+            status="healthy" if redis_healthy else "unhealthy",
+            circuit_breaker=redis_cb_status
+        )
+        return "redis", component, "healthy" if redis_healthy else "degraded"
             
     except Exception as e:
         logger.error(f"Failed to check Redis health: {e}")
-        health_status["components"]["redis"] = {
-            "status": "error",
-            "error": str(e)
-        }
-        health_status["overall"] = "unhealthy"
+        return "redis", ComponentHealth(status="error", error=str(e)), "unhealthy"
+
+
+async def _check_llm() -> Tuple[str, ComponentHealth, str]:
+    """Report LLM retry manager metrics."""
+    from services.llm_retry_manager import get_retry_manager as get_llm_retry_manager
     
-    # Check LLM service
     try:
         llm_manager = get_llm_retry_manager()
         llm_metrics = await llm_manager.get_metrics()
         
-        health_status["components"]["llm"] = {
-            "status": "healthy",
-            "metrics": llm_metrics
-        }
+        return "llm", ComponentHealth(status="healthy", metrics=llm_metrics), "healthy"
         
     except Exception as e:
         logger.error(f"Failed to check LLM health: {e}")
-        health_status["components"]["llm"] = {
-            "status": "error",
-            "error": str(e)
-        }
-    
-    # Check Database
+        return "llm", ComponentHealth(status="error", error=str(e)), "healthy"
+
+
+async def _check_db() -> Tuple[str, ComponentHealth, str]:
+    """Run a minimal query to verify database connectivity."""
     try:
-        db = DBConnection()
         # Simple query to check connectivity
-        client = await db.client
-        result = await asyncio.wait_for(
+        client = await (db or DBConnection()).client
+        await asyncio.wait_for(
             client.table('agents').select('id').limit(1).execute(),
             timeout=5.0
         )
         
-        health_status["components"]["database"] = {
-            "status": "healthy",
-            "connected": True
-        }
+        return "database", ComponentHealth(status="healthy", connected=True), "healthy"
         
     except Exception as e:
         logger.error(f"Failed to check database health: {e}")
-        health_status["components"]["database"] = {
-            "status": "unhealthy",
-            "error": str(e)
-        }
-        health_status["overall"] = "unhealthy"
+        return "database", ComponentHealth(status="unhealthy", error=str(e)), "unhealthy"
+
+
+DETAILED_HEALTH_CACHE_TTL = 3.0
+_detailed_health_cache: Optional[Tuple[float, DetailedHealth]] = None
+_detailed_health_lock = asyncio.Lock()
+
+
+async def _collect_detailed_health() -> DetailedHealth:
+    """Run all component probes concurrently and fold them into one status payload."""
+    health = DetailedHealth(timestamp=utcnow_iso())
     
-    # Set appropriate HTTP status code
-    if health_status["overall"] == "unhealthy":
-        raise HTTPException(status_code=503, detail=health_status)
-    elif health_status["overall"] == "degraded":
+    results = await asyncio.gather(
+        _check_daytona(),
+        _check_redis(),
+        _check_llm(),
+        _check_db(),
+        return_exceptions=True
+    )
+    
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error(f"Health probe raised unexpectedly: {result}")
+            health.overall = "unhealthy"
+            continue
+        name, component, status = result
+        health.components[name] = component
+        if _STATUS_SEVERITY[status] > _STATUS_SEVERITY[health.overall]:
+            health.overall = status
+    
+    if health.overall == "degraded":
         # Return 200 but indicate degraded status
-        health_status["warning"] = "Some services are degraded but system is operational"
+        health.warning = "Some services are degraded but system is operational"
     
-    return health_status
+    return health
+
+
+@router.get("/detailed")
+async def detailed_health_check() -> Dict[str, Any]:
+    """
+    Comprehensive health check for all system components.
+    
+    Returns detailed status of:
+    - Daytona sandbox service
+    - Redis cache and pub/sub
+    - LLM service providers
+    - Database connectivity
+    - Circuit breakers state
+    
+    Component probes are independent and run concurrently, so latency is
+    bounded by the slowest probe rather than their sum. Results are cached
+    for DETAILED_HEALTH_CACHE_TTL seconds so frequent callers don't turn
+    the health check itself into load on the backends.
+    """
+    global _detailed_health_cache
+    
+    cached = _detailed_health_cache
+    if cached is None or time.monotonic() - cached[0] >= DETAILED_HEALTH_CACHE_TTL:
+        async with _detailed_health_lock:
+            cached = _detailed_health_cache
+            if cached is None or time.monotonic() - cached[0] >= DETAILED_HEALTH_CACHE_TTL:
+                cached = (time.monotonic(), await _collect_detailed_health())
+                _detailed_health_cache = cached
+    
+    health = cached[1]
+    
+    # Set appropriate HTTP status code
+    if health.overall == "unhealthy":
+        raise HTTPException(status_code=503, detail=health.to_dict())
+    
+    return health.to_dict()
 
 
 @router.get("/daytona")
+@health_endpoint(name="Daytona health check", status_code=503)
 async def daytona_health() -> Dict[str, Any]:
     """Check Daytona sandbox service health."""
-    try:
-        checker = get_daytona_health_checker()
-        # Use a short timeout to prevent blocking
-        report = await asyncio.wait_for(
-            checker.check_health(force_refresh=True, detailed=True),
-            timeout=3.0
-        )
-        
-        circuit_breaker = get_daytona_circuit_breaker()
-        cb_metrics = circuit_breaker.get_metrics()
-        
-        return {
-            "status": report.status.value,
-            "healthy": report.is_healthy(),
-            "response_time_ms": report.response_time_ms,
-            "api_version": report.api_version,
-            "error": report.error_message,
-            "consecutive_failures": report.consecutive_failures,
-            "circuit_breaker": cb_metrics,
-            "metrics": checker.get_metrics()
-        }
-    except Exception as e:
-        logger.error(f"Daytona health check failed: {e}")
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "error",
-                "error": str(e)
-            }
-        )
+    from sandbox.daytona_health import get_daytona_health_checker
+    from sandbox.daytona_circuit_breaker import get_daytona_circuit_breaker
+    
+    checker = get_daytona_health_checker()
+    # Use a short timeout to prevent blocking
+    report = await asyncio.wait_for(
+        checker.check_health(force_refresh=True, detailed=True),
+        timeout=3.0
+    )
+    
+    circuit_breaker = get_daytona_circuit_breaker()
+    cb_metrics = circuit_breaker.get_metrics()
+    
+    return {
+        "status": report.status.value,
+        "healthy": report.is_healthy(),
+        "response_time_ms": report.response_time_ms,
+        "api_version": report.api_version,
+        "error": report.error_message,
+        "consecutive_failures": report.consecutive_failures,
+        "circuit_breaker": cb_metrics,
+        "metrics": checker.get_metrics()
+    }
 
 
 @router.get("/redis")
+@health_endpoint(name="Redis health check", status_code=503)
 async def redis_health() -> Dict[str, Any]:
     """Check Redis service health."""
+    import services.redis as redis_service
+    from services.redis_circuit_breaker import get_circuit_breaker as get_redis_circuit_breaker
+    
+    # Ping Redis to check connectivity
+    is_healthy = False
     try:
-        # Ping Redis to check connectivity
+        redis_client = await redis_service.get_client()
+        await redis_client.ping()
+        is_healthy = True
+    except:
         is_healthy = False
-        try:
-            await redis_service.get_client()
-            await redis_service.client.ping()
-            is_healthy = True
-        except:
-            is_healthy = False
-        
-        circuit_breaker = get_redis_circuit_breaker()
-        cb_status = await circuit_breaker.get_health_status()
-        
-        return {
-            "status": "healthy" if is_healthy else "unhealthy",
-            "connected": is_healthy,
-            "circuit_breaker": cb_status
-        }
-    except Exception as e:
-        logger.error(f"Redis health check failed: {e}")
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "error",
-                "error": str(e)
-            }
-        )
+    
+    circuit_breaker = get_redis_circuit_breaker()
+    cb_status = await circuit_breaker.get_health_status()
+    
+    return {
+        "status": "healthy" if is_healthy else "unhealthy",
+        "connected": is_healthy,
+        "circuit_breaker": cb_status
+    }
 
 
 @router.get("/llm")
+@health_endpoint(name="LLM health check", status_code=503)
 async def llm_health() -> Dict[str, Any]:
     """Check LLM service health and metrics."""
-    try:
-        retry_manager = get_llm_retry_manager()
-        metrics = await retry_manager.get_metrics()
-        
-        # Determine health based on metrics
-        status = "healthy"
-        if metrics["total_requests"] > 0:
-            avg_cost = metrics["average_cost_per_request"]
-            if avg_cost > 1.0:  # More than $1 per request average
-                status = "expensive"
-            
-            # Check model health
-            for model_name, model_metrics in metrics["models"].items():
-                if model_metrics["success_rate"] < 50:
-                    status = "degraded"
-                    break
+    from services.llm_retry_manager import get_retry_manager as get_llm_retry_manager
+    
+    retry_manager = get_llm_retry_manager()
+    metrics = await retry_manager.get_metrics()
+    
+    # Determine health based on metrics
+    status = "healthy"
+    if metrics["total_requests"] > 0:
+        avg_cost = metrics["average_cost_per_request"]
+        if avg_cost > 1.0:  # More than $1 per request average
+            status = "expensive"
         
-        return {
-            "status": status,
-            "metrics": metrics
-        }
-    except Exception as e:
-        logger.error(f"LLM health check failed: {e}")
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "error",
-                "error": str(e)
-            }
-        )
+        # Check model health
+        for model_name, model_metrics in metrics["models"].items():
+            if model_metrics["success_rate"] < 50:
+                status = "degraded"
+                break
+    
+    return {
+        "status": status,
+        "metrics": metrics
+    }
 
 
 @router.post("/reset-circuit-breakers")
+@health_endpoint(name="Circuit breaker reset")
 async def reset_circuit_breakers() -> Dict[str, str]:
     """Manually reset all circuit breakers."""
-    try:
-        # Reset Daytona circuit breaker
-        daytona_cb = get_daytona_circuit_breaker()
-        await daytona_cb.reset()
-        
-        # Reset Redis circuit breaker
-        redis_cb = get_redis_circuit_breaker()
-        await redis_cb.reset()
-        
-        # Reset LLM retry manager metrics
-        llm_manager = get_llm_retry_manager()
-        await llm_manager.reset_metrics()
-        
-        return {
-            "status": "success",
-            "message": "All circuit breakers have been reset"
-        }
-    except Exception as e:
-        logger.error(f"Failed to reset circuit breakers: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "status": "error",
-                "error": str(e)
-            }
-        )
\ No newline at end of file
+    from sandbox.daytona_circuit_breaker import get_daytona_circuit_breaker
+    from services.redis_circuit_breaker import get_circuit_breaker as get_redis_circuit_breaker
+    from services.llm_retry_manager import get_retry_manager as get_llm_retry_manager
+    
+    # Reset Daytona circuit breaker
+    daytona_cb = get_daytona_circuit_breaker()
+    daytona_cb.reset()
+    
+    # Reset Redis circuit breaker
+    redis_cb = get_redis_circuit_breaker()
+    await redis_cb.reset()
+    
+    # Reset LLM retry manager metrics
+    llm_manager = get_llm_retry_manager()
+    await llm_manager.reset_metrics()
+    
+    return {
+        "status": "success",
+        "message": "All circuit breakers have been reset"
+    }
\ No newline at end of file
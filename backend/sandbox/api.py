@@ -8,7 +8,7 @@ from fastapi.responses import Response
 from pydantic import BaseModel
 from daytona_sdk import AsyncSandbox
 
-from sandbox.sandbox import get_or_start_sandbox, delete_sandbox, daytona
+from sandbox.sandbox import get_or_start_sandbox, delete_sandbox, daytona, configure_daytona_transport
 from sandbox.health_check import (
     initialize_health_monitoring, get_health_checker, get_monitor,
     SandboxHealthStatus, SandboxHealthReport
@@ -26,6 +26,12 @@ def initialize(_db: DBConnection):
     global db
     db = _db
     
+    # Keep Daytona HTTP connections alive between calls
+    try:
+        configure_daytona_transport()
+    except Exception as e:
+        logger.error(f"Failed to configure Daytona HTTP transport: {e}")
+    
     # Initialize health monitoring
     try:
         initialize_health_monitoring(daytona)
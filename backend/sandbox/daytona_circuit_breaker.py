@@ -7,10 +7,11 @@ to prevent cascading failures and improve resilience.
 
 import asyncio
 import time
-from enum import Enum
+from enum import StrEnum
 from typing import TypeVar, Callable, Optional, Any
 from dataclasses import dataclass
 import functools
+from collections import defaultdict
 
 from utils.logger import logger
 from utils.error_handler import TransientError, SandboxError, TimeoutError
@@ -19,14 +20,14 @@ from sandbox.daytona_health import get_daytona_health_checker, DaytonaHealthStat
 T = TypeVar('T')
 
 
-class CircuitState(Enum):
-    """Circuit breaker states."""
+class CircuitState(StrEnum):
+    """Circuit breaker states. Members are their own string values."""
     CLOSED = "closed"      # Normal operation
     OPEN = "open"          # Circuit tripped, failing fast
     HALF_OPEN = "half_open"  # Testing recovery
 
 
-@dataclass
+@dataclass(slots=True)
 class DaytonaCircuitConfig:
     """Configuration for Daytona circuit breaker."""
     failure_threshold: int = 3          # Failures before opening circuit
@@ -38,25 +39,43 @@ class DaytonaCircuitConfig:
     create_sandbox_timeout: float = 30.0
     get_sandbox_timeout: float = 10.0
     execute_command_timeout: float = 20.0
+    
+    # Bulkhead: concurrent calls allowed per operation name
+    max_concurrent: int = 50
+    bulkhead_timeout: float = 5.0       # Max wait for a free slot
 
 
 class DaytonaCircuitBreaker:
     """Circuit breaker for Daytona service operations."""
     
+    __slots__ = (
+        "config", "state", "state_change_time",
+        "consecutive_failures", "consecutive_successes",
+        "successful_requests", "failed_requests", "health_checker", "_recovery_probe",
+        "_semaphores",
+    )
+    
     def __init__(self, config: Optional[DaytonaCircuitConfig] = None):
         """Initialize circuit breaker."""
         self.config = config or DaytonaCircuitConfig()
         self.state = CircuitState.CLOSED
-        self.state_change_time = time.time()
+        self.state_change_time = time.monotonic()
         
         # Metrics
         self.consecutive_failures = 0
         self.consecutive_successes = 0
-        self.total_requests = 0
+        self.successful_requests = 0
         self.failed_requests = 0
         
         # Health checker integration
         self.health_checker = get_daytona_health_checker()
+        self._recovery_probe: Optional[asyncio.Task] = None
+        
+        # Independent bulkhead per operation so one saturated operation
+        # (e.g. create_sandbox) doesn't starve the others
+        self._semaphores = defaultdict(
+            lambda: asyncio.Semaphore(self.config.max_concurrent)
+        )
         
         logger.info("Daytona circuit breaker initialized")
     
@@ -78,57 +97,70 @@ class DaytonaCircuitBreaker:
             Result of the operation
             
         Raises:
-            SandboxError: If circuit is open
+            SandboxError: If circuit is open or the bulkhead is saturated
             TimeoutError: If operation times out
             Exception: If operation fails
         """
-        # Check circuit state
-        if not await self._should_allow_request():
+        # Fail fast while open; recovery is detected by the background probe
+        # started on opening, or by recovery_timeout elapsing
+        if not self._should_allow_request():
             error_msg = f"Daytona circuit breaker OPEN - {operation_name} rejected"
             logger.warning(error_msg)
-            
-            # Check if service has recovered
-            health_report = await self.health_checker.check_health()
-            if health_report.is_healthy():
-                logger.info("Daytona service appears healthy, transitioning to HALF_OPEN")
-                self.state = CircuitState.HALF_OPEN
-                self.state_change_time = time.time()
-            else:
-                raise SandboxError(f"{error_msg}. Service status: {health_report.status.value}")
+            raise SandboxError(error_msg)
+        
+        semaphore = self._semaphores[operation_name]
+        await self._acquire_slot(semaphore, operation_name)
         
         # Execute operation with timeout
         timeout = timeout or self.config.timeout
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
-            logger.debug(f"Executing {operation_name} (timeout: {timeout}s)")
+            logger.debug("Executing %s (timeout: %ss)", operation_name, timeout)
             
-            result = await asyncio.wait_for(
-                operation(),
-                timeout=timeout
-            )
+            # asyncio.timeout cancels in place instead of wrapping the
+            # operation in an extra Task like wait_for does
+            async with asyncio.timeout(timeout):
+                result = await operation()
             
             # Record success
-            latency = time.time() - start_time
-            await self._record_success(latency)
+            latency = time.monotonic() - start_time
+            self._record_success(latency)
             
-            logger.info(f"{operation_name} succeeded in {latency:.2f}s")
+            logger.info("%s succeeded in %.2fs", operation_name, latency)
             return result
             
         except asyncio.TimeoutError:
-            await self._record_failure()
+            self._record_failure()
             error_msg = f"{operation_name} timed out after {timeout}s"
             logger.error(error_msg)
             raise TimeoutError(error_msg)
             
         except Exception as e:
-            await self._record_failure()
-            logger.error(f"{operation_name} failed: {e}")
+            self._record_failure()
+            logger.error("%s failed: %s", operation_name, e)
             raise
+        
+        finally:
+            semaphore.release()
     
-    async def _should_allow_request(self) -> bool:
+    async def _acquire_slot(self, semaphore: asyncio.Semaphore, operation_name: str):
+        """Wait for a bulkhead slot, failing fast if none frees up in time."""
+        if not semaphore.locked():
+            await semaphore.acquire()
+            return
+        
+        try:
+            async with asyncio.timeout(self.config.bulkhead_timeout):
+                await semaphore.acquire()
+        except asyncio.TimeoutError:
+            error_msg = f"Daytona bulkhead saturated - {operation_name} rejected"
+            logger.warning(error_msg)
+            raise SandboxError(error_msg)
+    
+    def _should_allow_request(self) -> bool:
         """Check if request should be allowed based on circuit state."""
-        current_time = time.time()
+        current_time = time.monotonic()
         
         if self.state == CircuitState.CLOSED:
             return True
@@ -148,67 +180,134 @@ class DaytonaCircuitBreaker:
         
         return False
     
-    async def _record_success(self, latency: float):
+    def _record_success(self, latency: float):
         """Record successful operation."""
-        self.total_requests += 1
+        self.successful_requests += 1
         self.consecutive_successes += 1
         self.consecutive_failures = 0
         
-        # Check if we should close the circuit
-        if self.state == CircuitState.HALF_OPEN:
-            if self.consecutive_successes >= self.config.success_threshold:
-                logger.info(
-                    f"Circuit breaker: Closing after {self.consecutive_successes} successes"
-                )
-                self.state = CircuitState.CLOSED
-                self.state_change_time = time.time()
+        transition = _TRANSITIONS[self.state, "success"]
+        if transition is not None:
+            transition(self)
     
-    async def _record_failure(self):
+    def _record_failure(self):
         """Record failed operation and potentially open circuit."""
-        self.total_requests += 1
         self.failed_requests += 1
         self.consecutive_failures += 1
         self.consecutive_successes = 0
         
-        # Check if we should open the circuit
-        if self.consecutive_failures >= self.config.failure_threshold:
-            if self.state != CircuitState.OPEN:
-                logger.warning(
-                    f"Circuit breaker: Opening after {self.consecutive_failures} failures"
-                )
-                self.state = CircuitState.OPEN
-                self.state_change_time = time.time()
+        transition = _TRANSITIONS[self.state, "failure"]
+        if transition is not None:
+            transition(self)
+    
+    def _start_recovery_probe(self) -> None:
+        """Check service health in the background after the circuit opens."""
+        if self._recovery_probe is None or self._recovery_probe.done():
+            self._recovery_probe = asyncio.create_task(self._probe_recovery())
+            self._recovery_probe.add_done_callback(self._recovery_probe_done)
+    
+    def _recovery_probe_done(self, task: asyncio.Task) -> None:
+        """Log a failed probe and forget the finished task."""
+        if self._recovery_probe is task:
+            self._recovery_probe = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Daytona recovery probe failed: %r", task.exception())
+    
+    async def aclose(self) -> None:
+        """Cancel a recovery probe that is still running."""
+        probe = self._recovery_probe
+        if probe is not None and not probe.done():
+            probe.cancel()
+            try:
+                await probe
+            except asyncio.CancelledError:
+                pass
+    
+    async def _probe_recovery(self) -> None:
+        """Move to HALF_OPEN early if Daytona reports healthy again."""
+        health_report = await self.health_checker.check_health(force_refresh=True)
+        if self.state == CircuitState.OPEN and health_report.is_healthy():
+            logger.info("Daytona service appears healthy, transitioning to HALF_OPEN")
+            self.state = CircuitState.HALF_OPEN
+            self.state_change_time = time.monotonic()
     
     def get_state(self) -> str:
         """Get current circuit state."""
-        return self.state.value
+        return self.state
+    
+    def is_open(self) -> bool:
+        """Whether requests are currently rejected: OPEN and not yet due for a recovery attempt."""
+        return (
+            self.state == CircuitState.OPEN
+            and time.monotonic() - self.state_change_time < self.config.recovery_timeout
+        )
+    
+    @property
+    def total_requests(self) -> int:
+        """Total operations recorded, successful or not."""
+        return self.successful_requests + self.failed_requests
     
     def get_metrics(self) -> dict:
         """Get circuit breaker metrics."""
+        total_requests = self.successful_requests + self.failed_requests
         success_rate = (
-            ((self.total_requests - self.failed_requests) / self.total_requests * 100)
-            if self.total_requests > 0 else 100
+            self.successful_requests / total_requests * 100
+            if total_requests else 100
         )
         
         return {
-            "state": self.state.value,
-            "state_duration": time.time() - self.state_change_time,
-            "total_requests": self.total_requests,
+            "state": self.state,
+            "state_duration": time.monotonic() - self.state_change_time,
+            "total_requests": total_requests,
             "failed_requests": self.failed_requests,
             "success_rate": success_rate,
             "consecutive_failures": self.consecutive_failures,
             "consecutive_successes": self.consecutive_successes,
         }
     
-    async def reset(self):
+    def reset(self):
         """Manually reset circuit breaker."""
         logger.info("Circuit breaker: Manual reset")
         self.state = CircuitState.CLOSED
-        self.state_change_time = time.time()
+        self.state_change_time = time.monotonic()
         self.consecutive_failures = 0
         self.consecutive_successes = 0
 
 
+def _close_if_recovered(breaker: DaytonaCircuitBreaker) -> None:
+    """HALF_OPEN + success: close once enough test requests have succeeded."""
+    if breaker.consecutive_successes >= breaker.config.success_threshold:
+        logger.info(
+            "Circuit breaker: Closing after %d successes",
+            breaker.consecutive_successes
+        )
+        breaker.state = CircuitState.CLOSED
+        breaker.state_change_time = time.monotonic()
+
+
+def _open_if_tripped(breaker: DaytonaCircuitBreaker) -> None:
+    """CLOSED/HALF_OPEN + failure: open once the failure threshold is reached."""
+    if breaker.consecutive_failures >= breaker.config.failure_threshold:
+        logger.warning(
+            "Circuit breaker: Opening after %d failures",
+            breaker.consecutive_failures
+        )
+        breaker.state = CircuitState.OPEN
+        breaker.state_change_time = time.monotonic()
+        breaker._start_recovery_probe()
+
+
+# State transition to attempt for each (state, outcome); None means stay put
+_TRANSITIONS = {
+    (CircuitState.CLOSED, "success"): None,
+    (CircuitState.OPEN, "success"): None,
+    (CircuitState.HALF_OPEN, "success"): _close_if_recovered,
+    (CircuitState.CLOSED, "failure"): _open_if_tripped,
+    (CircuitState.OPEN, "failure"): None,
+    (CircuitState.HALF_OPEN, "failure"): _open_if_tripped,
+}
+
+
 # Global circuit breaker instance
 _circuit_breaker: Optional[DaytonaCircuitBreaker] = None
 
@@ -221,6 +320,12 @@ def get_daytona_circuit_breaker() -> DaytonaCircuitBreaker:
     return _circuit_breaker
 
 
+async def close_daytona_circuit_breaker() -> None:
+    """Stop the global circuit breaker's background recovery probe."""
+    if _circuit_breaker is not None:
+        await _circuit_breaker.aclose()
+
+
 async def execute_with_circuit_breaker(
     operation: Callable[[], T],
     operation_name: str = "daytona_operation",
@@ -8,10 +8,10 @@ for the Daytona sandbox service to prevent tool hanging issues.
 import asyncio
 import time
 import aiohttp
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone, timedelta
-from dataclasses import dataclass, field
-from enum import Enum
+from dataclasses import dataclass, field, replace
+from enum import StrEnum
 import os
 
 from utils.logger import logger
@@ -21,15 +21,24 @@ from utils.error_handler import (
 )
 
 
-class DaytonaHealthStatus(Enum):
-    """Health status for Daytona service."""
+# Endpoints tried to determine health, in order of preference
+HEALTH_ENDPOINTS = (
+    "/health",
+    "/api/health",
+    "/v1/health",
+    "/"  # Root endpoint as fallback
+)
+
+
+class DaytonaHealthStatus(StrEnum):
+    """Health status for Daytona service. Members are their own string values."""
     HEALTHY = "healthy"
     DEGRADED = "degraded"
     UNHEALTHY = "unhealthy"
     UNAVAILABLE = "unavailable"
 
 
-@dataclass
+@dataclass(slots=True)
 class DaytonaHealthReport:
     """Health report for Daytona service."""
     status: DaytonaHealthStatus
@@ -46,7 +55,7 @@ class DaytonaHealthReport:
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for serialization."""
         return {
-            "status": self.status.value,
+            "status": self.status,
             "response_time_ms": self.response_time_ms,
             "api_version": self.api_version,
             "error_message": self.error_message,
@@ -56,9 +65,66 @@ class DaytonaHealthReport:
         }
 
 
+# Fixed error reports, keyed by the HTTP status that produces them. Copied with
+# a fresh timestamp and failure count via _from_template() on use.
+_STATUS_REPORTS = {
+    401: DaytonaHealthReport(
+        status=DaytonaHealthStatus.UNHEALTHY,
+        error_message="Authentication failed - check API key"
+    ),
+    403: DaytonaHealthReport(
+        status=DaytonaHealthStatus.UNHEALTHY,
+        error_message="Authorization failed - check permissions"
+    ),
+    429: DaytonaHealthReport(
+        status=DaytonaHealthStatus.DEGRADED,
+        error_message="Rate limited - too many requests"
+    ),
+}
+
+# Credential problems are conclusive whichever endpoint reports them
+_AUTH_FAILURE_MESSAGES = frozenset(
+    _STATUS_REPORTS[status].error_message for status in (401, 403)
+)
+
+# How long an endpoint gets before the next one is probed alongside it
+_HEDGE_DELAY = 0.5
+
+_ALL_CHECKS_FAILED = DaytonaHealthReport(
+    status=DaytonaHealthStatus.UNAVAILABLE,
+    error_message="Service unavailable - all health checks failed"
+)
+
+_SOME_CHECKS_FAILED = DaytonaHealthReport(
+    status=DaytonaHealthStatus.DEGRADED,
+    error_message="Some health checks failed"
+)
+
+
+def _from_template(
+    template: DaytonaHealthReport,
+    consecutive_failures: int
+) -> DaytonaHealthReport:
+    """Copy a template report with a fresh timestamp and failure count."""
+    return replace(
+        template,
+        last_check=datetime.now(timezone.utc),
+        consecutive_failures=consecutive_failures
+    )
+
+
 class DaytonaHealthChecker:
     """Health checker for Daytona sandbox service."""
     
+    __slots__ = (
+        "server_url", "api_key", "target",
+        "health_check_timeout", "connection_timeout", "max_consecutive_failures",
+        "_health_urls", "_probe_timeout", "_default_headers", "_session",
+        "_health_cache", "_cache_ttl", "_last_check_time", "_inflight",
+        "_healthy_event", "_poller", "_waiters",
+        "total_checks", "failed_checks", "average_response_time", "consecutive_failures",
+    )
+    
     def __init__(self):
         """Initialize health checker with configuration."""
         self.server_url = os.getenv("DAYTONA_SERVER_URL", "https://app.daytona.io/api")
@@ -70,10 +136,35 @@ class DaytonaHealthChecker:
         self.connection_timeout = 1.0     # 1 second for initial connection
         self.max_consecutive_failures = 3  # Mark unhealthy after 3 failures
         
+        # Probe URLs and timeout don't change after startup
+        base_url = self.server_url.rstrip('/')
+        self._health_urls = tuple(f"{base_url}{endpoint}" for endpoint in HEALTH_ENDPOINTS)
+        self._probe_timeout = aiohttp.ClientTimeout(
+            total=self.health_check_timeout,
+            connect=self.connection_timeout
+        )
+        
+        # Built once and attached to the shared session
+        self._default_headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "X-Target": self.target,
+            "Content-Type": "application/json"
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        
         # Caching
         self._health_cache: Optional[DaytonaHealthReport] = None
         self._cache_ttl = 30  # Cache for 30 seconds
         self._last_check_time: Optional[float] = None
+        # Probe currently running; concurrent callers await it instead of
+        # issuing their own request
+        self._inflight: Optional[asyncio.Task] = None
+        
+        # Set while the latest report is healthy; wait_for_healthy() sleeps on it
+        # while a single background poller refreshes the status
+        self._healthy_event = asyncio.Event()
+        self._poller: Optional[asyncio.Task] = None
+        self._waiters = 0
         
         # Metrics
         self.total_checks = 0
@@ -104,30 +195,51 @@ class DaytonaHealthChecker:
         """
         # Use cached result if available and not expired
         if not force_refresh and self._health_cache and self._last_check_time:
-            cache_age = time.time() - self._last_check_time
+            cache_age = time.monotonic() - self._last_check_time
             if cache_age < self._cache_ttl:
-                logger.debug(f"Using cached Daytona health report (age: {cache_age:.1f}s)")
+                logger.debug("Using cached Daytona health report (age: %.1fs)", cache_age)
                 return self._health_cache
         
+        # Coalesce concurrent cache misses onto a single probe. The probe runs
+        # in its own task so a cancelled caller doesn't abort it for the others.
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._refresh_health(detailed))
+            self._inflight.add_done_callback(self._clear_inflight)
+        return await asyncio.shield(self._inflight)
+    
+    def last_ok_within(self, seconds: float) -> bool:
+        """Whether a check in the last `seconds` found the service usable (healthy or degraded)."""
+        return (
+            self._health_cache is not None
+            and self._last_check_time is not None
+            and time.monotonic() - self._last_check_time < seconds
+            and self._health_cache.status in (DaytonaHealthStatus.HEALTHY, DaytonaHealthStatus.DEGRADED)
+        )
+    
+    def _clear_inflight(self, task: asyncio.Task) -> None:
+        """Drop the finished probe so the next cache miss starts a new one."""
+        if self._inflight is task:
+            self._inflight = None
+    
+    async def _refresh_health(self, detailed: bool) -> DaytonaHealthReport:
+        """Run a health check and store the result in the cache."""
         self.total_checks += 1
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
             # Perform health check
             report = await self._perform_health_check(detailed)
             
             # Update metrics
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.monotonic() - start_time) * 1000
             report.response_time_ms = response_time
             self._update_metrics(response_time, success=True)
             
-            # Cache result
-            self._health_cache = report
-            self._last_check_time = time.time()
+            self._store_report(report)
             
             logger.info(
-                f"Daytona health check: {report.status.value} "
-                f"(response time: {response_time:.1f}ms)"
+                "Daytona health check: %s (response time: %.1fms)",
+                report.status, response_time
             )
             
             return report
@@ -145,112 +257,149 @@ class DaytonaHealthChecker:
                 consecutive_failures=self.consecutive_failures
             )
             
-            # Cache negative result for shorter time
-            self._health_cache = report
-            self._last_check_time = time.time()
+            self._store_report(report)
             
             return report
     
+    def _store_report(self, report: DaytonaHealthReport) -> None:
+        """Cache a fresh report and wake any wait_for_healthy() callers."""
+        self._health_cache = report
+        self._last_check_time = time.monotonic()
+        
+        if report.is_healthy():
+            self._healthy_event.set()
+        else:
+            self._healthy_event.clear()
+    
     async def _perform_health_check(self, detailed: bool) -> DaytonaHealthReport:
         """Perform actual health check against Daytona API."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "X-Target": self.target,
-            "Content-Type": "application/json"
-        }
+        session = self._get_session()
+        urls = self._health_urls
         
-        # Try multiple endpoints to determine health
-        health_endpoints = [
-            "/health",
-            "/api/health",
-            "/v1/health",
-            "/"  # Root endpoint as fallback
-        ]
+        # Endpoints are tried in order like a sequential check, but the next
+        # one is started early if the current one hasn't answered within
+        # _HEDGE_DELAY. Answers are taken in endpoint order, except that an
+        # auth failure from any endpoint is conclusive, so a 200 from a
+        # fallback endpoint can't mask a bad API key.
+        tasks: List[asyncio.Task] = []
         
-        async with aiohttp.ClientSession() as session:
-            for endpoint in health_endpoints:
-                try:
-                    url = f"{self.server_url.rstrip('/')}{endpoint}"
-                    
-                    async with session.get(
-                        url,
-                        headers=headers,
-                        timeout=aiohttp.ClientTimeout(
-                            total=self.health_check_timeout,
-                            connect=self.connection_timeout
-                        )
-                    ) as response:
-                        if response.status in [200, 204]:
-                            # Success - service is healthy
+        def launch_next():
+            tasks.append(asyncio.create_task(self._probe(session, urls[len(tasks)])))
+        
+        launch_next()
+        try:
+            while True:
+                for task in tasks:
+                    if not task.done():
+                        break
+                    report = task.result()
+                    if report is not None:
+                        if report.status == DaytonaHealthStatus.HEALTHY:
                             self.consecutive_failures = 0
-                            
-                            # Try to get version info if available
-                            api_version = None
-                            try:
-                                data = await response.json()
-                                api_version = data.get("version") or data.get("api_version")
-                            except:
-                                pass
-                            
-                            return DaytonaHealthReport(
-                                status=DaytonaHealthStatus.HEALTHY,
-                                api_version=api_version,
-                                consecutive_failures=0
-                            )
-                        
-                        elif response.status == 401:
-                            # Authentication issue
-                            return DaytonaHealthReport(
-                                status=DaytonaHealthStatus.UNHEALTHY,
-                                error_message="Authentication failed - check API key",
-                                consecutive_failures=self.consecutive_failures
-                            )
-                        
-                        elif response.status == 403:
-                            # Authorization issue
-                            return DaytonaHealthReport(
-                                status=DaytonaHealthStatus.UNHEALTHY,
-                                error_message="Authorization failed - check permissions",
-                                consecutive_failures=self.consecutive_failures
-                            )
-                        
-                        elif response.status == 429:
-                            # Rate limited
-                            return DaytonaHealthReport(
-                                status=DaytonaHealthStatus.DEGRADED,
-                                error_message="Rate limited - too many requests",
-                                consecutive_failures=self.consecutive_failures
-                            )
-                        
-                        elif response.status >= 500:
-                            # Server error
-                            return DaytonaHealthReport(
-                                status=DaytonaHealthStatus.UNHEALTHY,
-                                error_message=f"Server error: {response.status}",
-                                consecutive_failures=self.consecutive_failures
-                            )
-                        
-                except asyncio.TimeoutError:
-                    continue  # Try next endpoint
-                except aiohttp.ClientError as e:
-                    logger.debug(f"Failed to check {endpoint}: {e}")
+                        return report
+                else:
+                    # Everything launched so far was inconclusive
+                    if len(tasks) == len(urls):
+                        break
+                    launch_next()
                     continue
+                
+                pending = [task for task in tasks if not task.done()]
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=_HEDGE_DELAY if len(tasks) < len(urls) else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    report = task.result()
+                    if report is not None and report.error_message in _AUTH_FAILURE_MESSAGES:
+                        return report
+                if not done:
+                    launch_next()
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
         
         # All endpoints failed
         self.consecutive_failures += 1
         
         if self.consecutive_failures >= self.max_consecutive_failures:
-            return DaytonaHealthReport(
-                status=DaytonaHealthStatus.UNAVAILABLE,
-                error_message="Service unavailable - all health checks failed",
-                consecutive_failures=self.consecutive_failures
-            )
+            return _from_template(_ALL_CHECKS_FAILED, self.consecutive_failures)
         else:
-            return DaytonaHealthReport(
-                status=DaytonaHealthStatus.DEGRADED,
-                error_message="Some health checks failed",
-                consecutive_failures=self.consecutive_failures
+            return _from_template(_SOME_CHECKS_FAILED, self.consecutive_failures)
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=10,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60
+                ),
+                headers=self._default_headers
             )
+        return self._session
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _probe(
+        self,
+        session: aiohttp.ClientSession,
+        url: str
+    ) -> Optional[DaytonaHealthReport]:
+        """
+        Probe a single health endpoint.
+        
+        Returns:
+            DaytonaHealthReport for a conclusive response, None if the endpoint
+            timed out, errored or returned an unrecognised status
+        """
+        try:
+            async with session.get(url, timeout=self._probe_timeout) as response:
+                if response.status in [200, 204]:
+                    # Success - service is healthy
+                    # Try to get version info if available
+                    api_version = None
+                    try:
+                        data = await response.json()
+                        api_version = data.get("version") or data.get("api_version")
+                    except:
+                        pass
+                    
+                    return DaytonaHealthReport(
+                        status=DaytonaHealthStatus.HEALTHY,
+                        api_version=api_version,
+                        consecutive_failures=0
+                    )
+                
+                elif response.status in _STATUS_REPORTS:
+                    # Auth, permission or rate-limit problem
+                    return _from_template(
+                        _STATUS_REPORTS[response.status],
+                        self.consecutive_failures
+                    )
+                
+                elif response.status >= 500:
+                    # Server error
+                    return DaytonaHealthReport(
+                        status=DaytonaHealthStatus.UNHEALTHY,
+                        error_message=f"Server error: {response.status}",
+                        consecutive_failures=self.consecutive_failures
+                    )
+                
+        except asyncio.TimeoutError:
+            pass
+        except aiohttp.ClientError as e:
+            logger.debug("Failed to check %s: %s", url, e)
+        
+        return None
     
     def _update_metrics(self, response_time: float, success: bool):
         """Update internal metrics."""
@@ -283,13 +432,13 @@ class DaytonaHealthChecker:
         
         elif report.status == DaytonaHealthStatus.DEGRADED:
             # Allow degraded service but log warning
-            logger.warning(f"Daytona service degraded: {report.error_message}")
+            logger.warning("Daytona service degraded: %s", report.error_message)
             return True, report.error_message
         
         else:
             # Don't allow unhealthy or unavailable service
             error_msg = (
-                f"Daytona service {report.status.value}: {report.error_message}. "
+                f"Daytona service {report.status}: {report.error_message}. "
                 f"Tool execution may fail."
             )
             return False, error_msg
@@ -309,24 +458,41 @@ class DaytonaHealthChecker:
         Returns:
             True if service became healthy, False if timeout
         """
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
+        self._waiters += 1
+        try:
+            if self._poller is None or self._poller.done():
+                # Don't trust a stale healthy report; the poller re-checks first
+                self._healthy_event.clear()
+                self._poller = asyncio.create_task(
+                    self._poll_until_healthy(check_interval)
+                )
+            
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._healthy_event.wait()
+            except asyncio.TimeoutError:
+                logger.error("Daytona service did not become healthy within %ss", timeout)
+                return False
+            
+            logger.info("Daytona service is healthy")
+            return True
+        finally:
+            self._waiters -= 1
+    
+    async def _poll_until_healthy(self, check_interval: float) -> None:
+        """Refresh health on a fixed cadence while anyone is waiting for it."""
+        while self._waiters > 0:
             report = await self.check_health(force_refresh=True)
             
             if report.is_healthy():
-                logger.info("Daytona service is healthy")
-                return True
+                return
             
             logger.debug(
-                f"Waiting for Daytona to become healthy "
-                f"(current: {report.status.value})"
+                "Waiting for Daytona to become healthy (current: %s)",
+                report.status
             )
             
             await asyncio.sleep(check_interval)
-        
-        logger.error(f"Daytona service did not become healthy within {timeout}s")
-        return False
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get current metrics."""
@@ -342,7 +508,7 @@ class DaytonaHealthChecker:
             "average_response_time_ms": self.average_response_time,
             "consecutive_failures": self.consecutive_failures,
             "last_health_status": (
-                self._health_cache.status.value 
+                self._health_cache.status 
                 if self._health_cache else "unknown"
             )
         }
@@ -360,6 +526,12 @@ def get_daytona_health_checker() -> DaytonaHealthChecker:
     return _health_checker
 
 
+async def close_daytona_health_checker() -> None:
+    """Release the global health checker's HTTP session."""
+    if _health_checker is not None:
+        await _health_checker.aclose()
+
+
 async def check_daytona_health(
     force_refresh: bool = False
 ) -> DaytonaHealthReport:
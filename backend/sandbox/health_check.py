@@ -6,13 +6,15 @@ for Daytona sandboxes to ensure reliability and early detection of issues.
 """
 
 import asyncio
+import math
 import time
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Set, Tuple
 from datetime import datetime, timezone, timedelta
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from enum import Enum
 
-from daytona_sdk import AsyncSandbox, SandboxState
+from daytona_sdk import AsyncSandbox, SandboxState, SessionExecuteRequest
 from utils.logger import logger
 from utils.error_handler import (
     ErrorHandler, ErrorType, ErrorSeverity,
@@ -20,6 +22,64 @@ from utils.error_handler import (
 )
 
 
+def _parse_memory_usage(output: str) -> Optional[str]:
+    """Used memory percentage from /proc/meminfo."""
+    fields = {}
+    for line in output.splitlines():
+        key, _, value = line.partition(":")
+        if key in ("MemTotal", "MemAvailable"):
+            fields[key] = int(value.split()[0])
+    total = fields.get("MemTotal")
+    available = fields.get("MemAvailable")
+    if not total or available is None:
+        return None
+    return f"{(1 - available / total) * 100:.1f}%"
+
+
+def _parse_cpu_load(output: str) -> Optional[str]:
+    """1, 5 and 15 minute load averages from /proc/loadavg."""
+    loads = output.split()[:3]
+    return ", ".join(loads) if len(loads) == 3 else None
+
+
+def _parse_disk_usage(output: str) -> Optional[str]:
+    """Root filesystem usage percentage, rounded up like df, from stat -f."""
+    blocks, free, available = (int(value) for value in output.split())
+    used = blocks - free
+    if used + available <= 0:
+        return None
+    return f"{-(-used * 100 // (used + available))}%"
+
+
+# Detailed-check probes. All of them run in a single remote command, with
+# their outputs separated by _PROBE_SEPARATOR. Service probes are
+# (key, shell command); resource probes only read /proc or stat and their
+# raw output is parsed here, as (key, shell command, parser).
+_SERVICE_PROBES = (
+    ("supervisord", "pgrep supervisord"),
+    ("chrome", "pgrep chrome || pgrep chromium"),
+    ("vnc", "pgrep Xvnc || pgrep x11vnc"),
+)
+_RESOURCE_PROBES = (
+    ("disk_usage", "stat -f -c '%b %f %a' /", _parse_disk_usage),
+    ("memory_usage", "cat /proc/meminfo", _parse_memory_usage),
+    ("cpu_load", "cat /proc/loadavg", _parse_cpu_load),
+)
+_PROBE_SEPARATOR = "__SEP__"
+_PROBE_COMMAND = f"; echo {_PROBE_SEPARATOR}; ".join(
+    [command for _, command in _SERVICE_PROBES]
+    + [command for _, command, _ in _RESOURCE_PROBES]
+)
+# Persistent shell session that probes are dispatched to, so each probe
+# doesn't spawn a fresh shell in the sandbox
+_HEALTH_SESSION_ID = "healthcheck-session"
+
+# Worst case for one check: the sandbox lookup plus one probe, 5s each
+_PER_CHECK_TIMEOUT = 10.0
+# Error recorded on reports for sandboxes the batch budget cut off
+_BATCH_BUDGET_ERROR = "Health check exceeded batch budget"
+
+
 class SandboxHealthStatus(Enum):
     """Health status for sandbox components."""
     HEALTHY = "healthy"
@@ -28,19 +88,33 @@ class SandboxHealthStatus(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(slots=True)
 class SandboxHealthReport:
     """Complete health report for a sandbox."""
     sandbox_id: str
     status: SandboxHealthStatus
     state: Optional[str] = None
     connectivity: bool = False
-    services: Dict[str, bool] = field(default_factory=dict)
-    resources: Dict[str, Any] = field(default_factory=dict)
+    # Collections stay None until something is recorded, so reports for
+    # healthy sandboxes don't allocate empty containers
+    services: Optional[Dict[str, bool]] = None
+    resources: Optional[Dict[str, Any]] = None
     response_time_ms: Optional[float] = None
-    last_check: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
-    errors: List[str] = field(default_factory=list)
-    warnings: List[str] = field(default_factory=list)
+    last_check: float = field(default_factory=time.time)  # Unix timestamp
+    errors: Optional[List[str]] = None
+    warnings: Optional[List[str]] = None
+    
+    def add_error(self, message: str):
+        """Record an error on the report."""
+        if self.errors is None:
+            self.errors = []
+        self.errors.append(message)
+    
+    def add_warning(self, message: str):
+        """Record a warning on the report."""
+        if self.warnings is None:
+            self.warnings = []
+        self.warnings.append(message)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for serialization."""
@@ -49,23 +123,102 @@ class SandboxHealthReport:
             "status": self.status.value,
             "state": self.state,
             "connectivity": self.connectivity,
-            "services": self.services,
-            "resources": self.resources,
+            "services": self.services or {},
+            "resources": self.resources or {},
             "response_time_ms": self.response_time_ms,
-            "last_check": self.last_check.isoformat(),
-            "errors": self.errors,
-            "warnings": self.warnings
+            "last_check": datetime.fromtimestamp(self.last_check, timezone.utc).isoformat(),
+            "errors": self.errors or [],
+            "warnings": self.warnings or []
         }
 
 
+def _fingerprint(sandbox: AsyncSandbox) -> Tuple[Optional[str], Optional[str]]:
+    """Cheap identity of a sandbox's current lifecycle state."""
+    return sandbox.state, sandbox.updated_at
+
+
+class _ReportCache:
+    """
+    LRU cache of health reports that also expires entries after a TTL.
+    
+    Entries past the TTL but within twice the TTL are "stale": they may be
+    served again if the sandbox's fingerprint is unchanged (see
+    SandboxHealthChecker.check_sandbox_health), which extends the TTL
+    without re-running the probes. Past twice the TTL an entry is dropped.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # sandbox_id -> (report, fingerprint, expiry deadline, hard deadline)
+        self._entries: "OrderedDict[str, Tuple[SandboxHealthReport, Any, float, float]]" = OrderedDict()
+    
+    def get(self, sandbox_id: str) -> Optional[SandboxHealthReport]:
+        """Return the cached report if present and not expired."""
+        entry = self._entries.get(sandbox_id)
+        if entry is None or entry[2] <= time.monotonic():
+            return None
+        
+        self._entries.move_to_end(sandbox_id)
+        return entry[0]
+    
+    def get_stale(self, sandbox_id: str) -> Optional[Tuple[SandboxHealthReport, Any]]:
+        """Return (report, fingerprint) for an expired entry that may be revalidated."""
+        entry = self._entries.get(sandbox_id)
+        if entry is None:
+            return None
+        
+        if entry[3] <= time.monotonic():
+            del self._entries[sandbox_id]
+            return None
+        return entry[0], entry[1]
+    
+    def set(self, sandbox_id: str, report: SandboxHealthReport, fingerprint: Any = None):
+        """Store a report, evicting the least recently used entry if full."""
+        now = time.monotonic()
+        self._entries[sandbox_id] = (report, fingerprint, now + self.ttl, now + 2 * self.ttl)
+        self._entries.move_to_end(sandbox_id)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def revalidate(self, sandbox_id: str):
+        """Extend an entry's TTL, capped by its hard deadline."""
+        entry = self._entries.get(sandbox_id)
+        if entry is None:
+            return
+        report, fingerprint, _, hard_expires_at = entry
+        expires_at = min(time.monotonic() + self.ttl, hard_expires_at)
+        self._entries[sandbox_id] = (report, fingerprint, expires_at, hard_expires_at)
+        self._entries.move_to_end(sandbox_id)
+    
+    def pop(self, sandbox_id: str) -> Optional[SandboxHealthReport]:
+        """Remove and return a report."""
+        entry = self._entries.pop(sandbox_id, None)
+        return entry[0] if entry else None
+
+
 class SandboxHealthChecker:
     """Performs health checks on sandboxes."""
     
-    def __init__(self, daytona_client):
-        """Initialize health checker with Daytona client."""
+    def __init__(self, daytona_client, max_concurrency: int = 10):
+        """
+        Initialize health checker with Daytona client.
+        
+        Args:
+            daytona_client: Daytona client used to reach sandboxes
+            max_concurrency: Maximum sandboxes checked at once by batch_health_check
+        """
         self.daytona = daytona_client
-        self._health_cache: Dict[str, SandboxHealthReport] = {}
         self._cache_ttl = 30  # Cache health reports for 30 seconds
+        # Bounded so sandboxes that are gone don't stay cached forever
+        self._health_cache = _ReportCache(maxsize=1024, ttl=self._cache_ttl)
+        self._max_concurrency = max_concurrency
+        self._batch_semaphore = asyncio.Semaphore(max_concurrency)
+        # Checks currently running, keyed by (sandbox_id, detailed); concurrent
+        # callers for the same sandbox await the same probe
+        self._inflight: Dict[Tuple[str, bool], asyncio.Task] = {}
+        # Sandboxes whose health check session has been set up
+        self._health_sessions: Set[str] = set()
     
     async def check_sandbox_health(
         self,
@@ -84,66 +237,108 @@ class SandboxHealthChecker:
         Returns:
             SandboxHealthReport with health status
         """
+        sandbox = None
+        
         # Check cache first
-        if use_cache and sandbox_id in self._health_cache:
-            cached_report = self._health_cache[sandbox_id]
-            cache_age = (datetime.now(timezone.utc) - cached_report.last_check).total_seconds()
-            if cache_age < self._cache_ttl:
-                logger.debug(f"Using cached health report for sandbox {sandbox_id} (age: {cache_age:.1f}s)")
+        if use_cache:
+            cached_report = self._health_cache.get(sandbox_id)
+            if cached_report is not None:
+                logger.debug(f"Using cached health report for sandbox {sandbox_id}")
                 return cached_report
+            
+            # An expired healthy report is still good if the sandbox hasn't
+            # changed since: one API lookup instead of the remote probes.
+            # The fetched handle is reused on a mismatch.
+            stale = self._health_cache.get_stale(sandbox_id)
+            if stale is not None:
+                stale_report, fingerprint = stale
+                if stale_report.status == SandboxHealthStatus.HEALTHY and fingerprint is not None:
+                    try:
+                        sandbox = await self._get_sandbox(sandbox_id)
+                    except asyncio.TimeoutError:
+                        sandbox = None
+                    if sandbox is not None and _fingerprint(sandbox) == fingerprint:
+                        self._health_cache.revalidate(sandbox_id)
+                        logger.debug(f"Revalidated cached health report for sandbox {sandbox_id}")
+                        return stale_report
         
-        report = SandboxHealthReport(sandbox_id=sandbox_id)
+        key = (sandbox_id, detailed)
+        task = self._inflight.get(key)
+        if task is None:
+            # Run in its own task so a cancelled caller doesn't abort the
+            # check for the others waiting on it
+            task = asyncio.create_task(self._run_health_check(sandbox_id, detailed, sandbox))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+    
+    async def _run_health_check(
+        self,
+        sandbox_id: str,
+        detailed: bool,
+        sandbox: Optional[AsyncSandbox] = None
+    ) -> SandboxHealthReport:
+        """Probe a sandbox and cache the resulting report."""
+        report = SandboxHealthReport(sandbox_id=sandbox_id, status=SandboxHealthStatus.UNKNOWN)
         start_time = time.time()
         
         try:
-            # 1. Check sandbox existence and state
-            sandbox_state = await self._check_sandbox_state(sandbox_id)
+            # 1. Check sandbox existence and state. The handle is fetched once
+            #    (unless the caller already has it) and reused by the probes.
+            if sandbox is None:
+                sandbox = await self._get_sandbox(sandbox_id)
+            sandbox_state = sandbox.state if sandbox else None
             report.state = sandbox_state
             
-            if sandbox_state == SandboxState.RUNNING:
-                # 2. Check connectivity
-                report.connectivity = await self._check_connectivity(sandbox_id)
-                
-                # 3. Check essential services (if detailed)
-                if detailed:
-                    report.services = await self._check_services(sandbox_id)
-                
-                # 4. Check resource usage (if detailed)
+            if sandbox_state == SandboxState.STARTED:
+                # 2. Check connectivity, plus essential services and resource
+                #    usage if detailed. A successful detailed probe already
+                #    proves the sandbox is reachable, so no separate echo runs.
                 if detailed:
-                    report.resources = await self._check_resources(sandbox_id)
+                    report.connectivity, report.services, report.resources = await self._probe_all(sandbox)
+                else:
+                    report.connectivity = await self._check_connectivity(sandbox)
                 
                 # Determine overall status
                 if not report.connectivity:
                     report.status = SandboxHealthStatus.UNHEALTHY
-                    report.errors.append("Sandbox is not reachable")
+                    report.add_error("Sandbox is not reachable")
                 elif report.services and not all(report.services.values()):
                     report.status = SandboxHealthStatus.DEGRADED
                     failed_services = [s for s, healthy in report.services.items() if not healthy]
-                    report.warnings.append(f"Services degraded: {', '.join(failed_services)}")
+                    report.add_warning(f"Services degraded: {', '.join(failed_services)}")
                 else:
                     report.status = SandboxHealthStatus.HEALTHY
                     
             elif sandbox_state in [SandboxState.STOPPED, SandboxState.ARCHIVED]:
                 report.status = SandboxHealthStatus.UNHEALTHY
-                report.errors.append(f"Sandbox is {sandbox_state}")
+                report.add_error(f"Sandbox is {sandbox_state}")
             else:
                 report.status = SandboxHealthStatus.UNKNOWN
-                report.warnings.append(f"Unknown sandbox state: {sandbox_state}")
+                report.add_warning(f"Unknown sandbox state: {sandbox_state}")
         
         except asyncio.TimeoutError:
             report.status = SandboxHealthStatus.UNHEALTHY
-            report.errors.append("Health check timed out")
+            report.add_error("Health check timed out")
             logger.error(f"Health check timeout for sandbox {sandbox_id}")
         except Exception as e:
             report.status = SandboxHealthStatus.UNKNOWN
-            report.errors.append(f"Health check error: {str(e)}")
+            report.add_error(f"Health check error: {str(e)}")
             logger.error(f"Error checking health of sandbox {sandbox_id}: {e}")
         
         # Calculate response time
         report.response_time_ms = (time.time() - start_time) * 1000
         
-        # Cache the report
-        self._health_cache[sandbox_id] = report
+        # Cache the report, except for stopped/archived sandboxes: they are
+        # usually about to be restarted, so the next read should be fresh
+        if report.state in (SandboxState.STOPPED, SandboxState.ARCHIVED):
+            self._health_cache.pop(sandbox_id)
+            # Sessions don't survive a stop
+            self._health_sessions.discard(sandbox_id)
+        else:
+            self._health_cache.set(
+                sandbox_id, report, _fingerprint(sandbox) if sandbox else None
+            )
         
         # Log health status
         logger.info(
@@ -154,125 +349,144 @@ class SandboxHealthChecker:
         
         return report
     
-    async def _check_sandbox_state(self, sandbox_id: str) -> Optional[str]:
-        """Check the current state of a sandbox."""
+    def invalidate(self, sandbox_id: str):
+        """Drop any cached report for a sandbox, e.g. after it is deleted."""
+        self._health_cache.pop(sandbox_id)
+        self._health_sessions.discard(sandbox_id)
+    
+    async def _get_sandbox(self, sandbox_id: str) -> Optional[AsyncSandbox]:
+        """Fetch a sandbox handle, or None if it can't be retrieved."""
         try:
-            sandbox = await asyncio.wait_for(
+            return await asyncio.wait_for(
                 self.daytona.get(sandbox_id),
                 timeout=5.0
             )
-            return sandbox.state if sandbox else None
         except asyncio.TimeoutError:
-            logger.warning(f"Timeout checking state of sandbox {sandbox_id}")
+            logger.warning(f"Timeout fetching sandbox {sandbox_id}")
             raise
         except Exception as e:
-            logger.error(f"Error checking state of sandbox {sandbox_id}: {e}")
+            logger.error(f"Error fetching sandbox {sandbox_id}: {e}")
             return None
     
-    async def _check_connectivity(self, sandbox_id: str) -> bool:
-        """Check if sandbox is reachable via network."""
-        try:
-            sandbox = await asyncio.wait_for(
-                self.daytona.get(sandbox_id),
-                timeout=5.0
-            )
-            
-            # Try to execute a simple command
-            result = await asyncio.wait_for(
-                sandbox.process.execute("echo 'health_check'"),
-                timeout=5.0
-            )
-            
-            return result and "health_check" in str(result)
-        except asyncio.TimeoutError:
-            logger.warning(f"Connectivity check timeout for sandbox {sandbox_id}")
-            return False
-        except Exception as e:
-            logger.warning(f"Connectivity check failed for sandbox {sandbox_id}: {e}")
-            return False
-    
-    async def _check_services(self, sandbox_id: str) -> Dict[str, bool]:
-        """Check status of essential services in the sandbox."""
-        services = {}
+    async def _run_probe(
+        self,
+        sandbox: AsyncSandbox,
+        command: str,
+        timeout: int = 5
+    ) -> Tuple[Optional[int], str]:
+        """
+        Run a probe command in the sandbox's health check session.
+        
+        The session is created on first use. If it can't be used (e.g. the
+        sandbox restarted and lost it) the command falls back to a one-off
+        exec, and the session is recreated on the next probe.
+        
+        Returns:
+            Tuple of (exit code, output)
+        """
+        if sandbox.id not in self._health_sessions:
+            try:
+                await sandbox.process.create_session(_HEALTH_SESSION_ID)
+            except Exception as e:
+                # Most likely it already exists, e.g. created by another worker
+                logger.debug(f"Could not create health check session for sandbox {sandbox.id}: {e}")
+            self._health_sessions.add(sandbox.id)
         
         try:
-            sandbox = await self.daytona.get(sandbox_id)
-            
-            # Check supervisord
-            services["supervisord"] = await self._check_service(
-                sandbox, "pgrep supervisord", "supervisord"
-            )
-            
-            # Check Chrome/browser if needed
-            services["chrome"] = await self._check_service(
-                sandbox, "pgrep chrome || pgrep chromium", "chrome"
-            )
-            
-            # Check VNC server if needed
-            services["vnc"] = await self._check_service(
-                sandbox, "pgrep Xvnc || pgrep x11vnc", "vnc"
+            response = await sandbox.process.execute_session_command(
+                _HEALTH_SESSION_ID,
+                SessionExecuteRequest(command=command, var_async=False),
+                timeout=timeout
             )
-            
+            return response.exit_code, response.output or ""
+        except asyncio.TimeoutError:
+            raise
         except Exception as e:
-            logger.error(f"Error checking services for sandbox {sandbox_id}: {e}")
+            self._health_sessions.discard(sandbox.id)
+            logger.debug(f"Health check session unavailable for sandbox {sandbox.id}, using exec: {e}")
         
-        return services
+        result = await sandbox.process.exec(command, timeout=timeout)
+        return result.exit_code, result.result or ""
     
-    async def _check_service(
-        self,
-        sandbox: AsyncSandbox,
-        check_command: str,
-        service_name: str
-    ) -> bool:
-        """Check if a specific service is running."""
+    async def _check_connectivity(self, sandbox: AsyncSandbox) -> bool:
+        """Check if sandbox is reachable via network."""
         try:
-            result = await asyncio.wait_for(
-                sandbox.process.execute(check_command),
-                timeout=3.0
+            # Try to execute a simple command
+            exit_code, output = await asyncio.wait_for(
+                self._run_probe(sandbox, "echo 'health_check'"),
+                timeout=5.0
             )
-            is_running = result and result.exit_code == 0
-            logger.debug(f"Service {service_name}: {'running' if is_running else 'not running'}")
-            return is_running
+            
+            return exit_code == 0 and "health_check" in output
         except asyncio.TimeoutError:
-            logger.warning(f"Timeout checking service {service_name}")
+            logger.warning(f"Connectivity check timeout for sandbox {sandbox.id}")
             return False
         except Exception as e:
-            logger.warning(f"Error checking service {service_name}: {e}")
+            logger.warning(f"Connectivity check failed for sandbox {sandbox.id}: {e}")
             return False
     
-    async def _check_resources(self, sandbox_id: str) -> Dict[str, Any]:
-        """Check resource usage of the sandbox."""
+    async def _probe_all(self, sandbox: AsyncSandbox) -> Tuple[bool, Dict[str, bool], Dict[str, Any]]:
+        """
+        Check reachability, essential services and resource usage in one
+        remote command.
+        
+        Returns:
+            Tuple of (reachable, services, resources). Probes that fail or
+            produce no output are reported as not running / omitted.
+        """
+        services = {name: False for name, _ in _SERVICE_PROBES}
         resources = {}
         
         try:
-            sandbox = await self.daytona.get(sandbox_id)
-            
-            # Check disk usage
-            disk_result = await sandbox.process.execute("df -h / | tail -1 | awk '{print $5}'")
-            if disk_result and disk_result.exit_code == 0:
-                resources["disk_usage"] = disk_result.stdout.strip()
-            
-            # Check memory usage
-            mem_result = await sandbox.process.execute(
-                "free -m | grep Mem | awk '{printf \"%.1f%%\", $3/$2 * 100}'"
+            # The exit code is that of the last probe only, so it's ignored
+            _, output = await asyncio.wait_for(
+                self._run_probe(sandbox, _PROBE_COMMAND),
+                timeout=5.0
             )
-            if mem_result and mem_result.exit_code == 0:
-                resources["memory_usage"] = mem_result.stdout.strip()
-            
-            # Check CPU load
-            cpu_result = await sandbox.process.execute("uptime | awk -F'load average:' '{print $2}'")
-            if cpu_result and cpu_result.exit_code == 0:
-                resources["cpu_load"] = cpu_result.stdout.strip()
-            
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout probing services and resources of sandbox {sandbox.id}")
+            return False, services, resources
         except Exception as e:
-            logger.error(f"Error checking resources for sandbox {sandbox_id}: {e}")
+            logger.error(f"Error probing services and resources of sandbox {sandbox.id}: {e}")
+            return False, services, resources
+        
+        segments = [segment.strip() for segment in output.split(_PROBE_SEPARATOR)]
+        service_outputs = segments[:len(_SERVICE_PROBES)]
+        resource_outputs = segments[len(_SERVICE_PROBES):]
+        
+        # pgrep prints matching PIDs, so any output means the service is running
+        for (name, _), output in zip(_SERVICE_PROBES, service_outputs):
+            services[name] = bool(output)
+        
+        for (name, _, parse), output in zip(_RESOURCE_PROBES, resource_outputs):
+            if not output:
+                continue
+            try:
+                value = parse(output)
+            except (ValueError, IndexError):
+                # Truncated or malformed output only loses this resource
+                value = None
+            if value is not None:
+                resources[name] = value
         
+        return True, services, resources
+    
+    async def _check_services(self, sandbox: AsyncSandbox) -> Dict[str, bool]:
+        """Check status of essential services in the sandbox."""
+        _, services, _ = await self._probe_all(sandbox)
+        return services
+    
+    async def _check_resources(self, sandbox: AsyncSandbox) -> Dict[str, Any]:
+        """Check resource usage of the sandbox."""
+        _, _, resources = await self._probe_all(sandbox)
         return resources
     
     async def batch_health_check(
         self,
         sandbox_ids: List[str],
-        detailed: bool = False
+        detailed: bool = False,
+        timeout: float = 10.0,
+        use_cache: bool = True
     ) -> Dict[str, SandboxHealthReport]:
         """
         Perform health checks on multiple sandboxes in parallel.
@@ -280,30 +494,65 @@ class SandboxHealthChecker:
         Args:
             sandbox_ids: List of sandbox IDs to check
             detailed: Whether to perform detailed checks
+            timeout: Overall time budget for the batch; sandboxes not checked
+                in time are reported as UNKNOWN
+            use_cache: Whether to use cached results if available
             
         Returns:
             Dictionary mapping sandbox IDs to health reports
         """
-        tasks = [
-            self.check_sandbox_health(sid, detailed=detailed)
-            for sid in sandbox_ids
-        ]
+        async def bounded_check(sandbox_id: str) -> SandboxHealthReport:
+            # Limit concurrent checks so large batches don't flood Daytona
+            async with self._batch_semaphore:
+                return await self.check_sandbox_health(
+                    sandbox_id, detailed=detailed, use_cache=use_cache
+                )
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        tasks = [asyncio.create_task(bounded_check(sid)) for sid in sandbox_ids]
+        
+        # Keep whatever finished within the budget; one stuck sandbox
+        # shouldn't hold up the whole batch
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
         
         reports = {}
-        for sandbox_id, result in zip(sandbox_ids, results):
-            if isinstance(result, Exception):
-                logger.error(f"Health check failed for {sandbox_id}: {result}")
+        for sandbox_id, task in zip(sandbox_ids, tasks):
+            if task.cancelled():
+                logger.warning(f"Health check for {sandbox_id} exceeded batch budget of {timeout}s")
                 reports[sandbox_id] = SandboxHealthReport(
                     sandbox_id=sandbox_id,
                     status=SandboxHealthStatus.UNKNOWN,
-                    errors=[str(result)]
+                    errors=[_BATCH_BUDGET_ERROR]
+                )
+            elif task.exception() is not None:
+                logger.error(f"Health check failed for {sandbox_id}: {task.exception()}")
+                reports[sandbox_id] = SandboxHealthReport(
+                    sandbox_id=sandbox_id,
+                    status=SandboxHealthStatus.UNKNOWN,
+                    errors=[str(task.exception())]
                 )
             else:
-                reports[sandbox_id] = result
+                reports[sandbox_id] = task.result()
         
         return reports
+    
+    def batch_budget(self, count: int) -> float:
+        """Time needed to check ``count`` sandboxes at the configured concurrency."""
+        return math.ceil(count / self._max_concurrency) * _PER_CHECK_TIMEOUT
+
+
+@dataclass(slots=True)
+class _MonitoredSandbox:
+    """Monitoring schedule and state for one sandbox."""
+    interval: int
+    auto_recover: bool
+    detailed_every: int
+    next_due: float  # time.monotonic() deadline for the next check
+    cycle: int = 0
+    last_state: Optional[str] = None
 
 
 class SandboxMonitor:
@@ -313,15 +562,24 @@ class SandboxMonitor:
         """Initialize monitor with health checker and Daytona client."""
         self.health_checker = health_checker
         self.daytona = daytona_client
-        self._monitoring_tasks: Dict[str, asyncio.Task] = {}
         self._recovery_attempts: Dict[str, int] = {}
         self._max_recovery_attempts = 3
+        
+        # All monitored sandboxes share one scheduler task, which checks the
+        # ones that are due together through batch_health_check
+        self._monitored: Dict[str, _MonitoredSandbox] = {}
+        self._scheduler_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        # Recoveries run beside the scheduler so a slow restart doesn't hold
+        # up checks of the other sandboxes; at most one per sandbox
+        self._recoveries: Dict[str, asyncio.Task] = {}
     
     async def start_monitoring(
         self,
         sandbox_id: str,
         interval: int = 60,
-        auto_recover: bool = True
+        auto_recover: bool = True,
+        detailed_every: int = 5
     ):
         """
         Start monitoring a sandbox with periodic health checks.
@@ -330,60 +588,157 @@ class SandboxMonitor:
             sandbox_id: ID of the sandbox to monitor
             interval: Health check interval in seconds
             auto_recover: Whether to automatically attempt recovery
+            detailed_every: Run detailed service/resource probes every this
+                many checks; the checks in between only verify connectivity
+                while the sandbox stays STARTED
         """
-        if sandbox_id in self._monitoring_tasks:
+        if sandbox_id in self._monitored:
             logger.warning(f"Monitoring already active for sandbox {sandbox_id}")
             return
+        if detailed_every < 1:
+            raise ValueError(f"detailed_every must be at least 1, got {detailed_every}")
         
-        async def monitor_loop():
-            """Monitoring loop for a sandbox."""
-            logger.info(f"Starting health monitoring for sandbox {sandbox_id}")
-            
-            while True:
-                try:
-                    # Perform health check
-                    report = await self.health_checker.check_sandbox_health(
-                        sandbox_id,
-                        detailed=True,
-                        use_cache=False
-                    )
-                    
-                    # Handle unhealthy sandbox
-                    if report.status == SandboxHealthStatus.UNHEALTHY and auto_recover:
-                        await self._handle_unhealthy_sandbox(sandbox_id, report)
-                    elif report.status == SandboxHealthStatus.DEGRADED:
-                        logger.warning(
-                            f"Sandbox {sandbox_id} is degraded: {report.warnings}"
-                        )
-                    
-                    # Reset recovery attempts on healthy status
-                    if report.status == SandboxHealthStatus.HEALTHY:
-                        self._recovery_attempts[sandbox_id] = 0
-                    
-                    await asyncio.sleep(interval)
-                    
-                except asyncio.CancelledError:
-                    logger.info(f"Stopping health monitoring for sandbox {sandbox_id}")
-                    break
-                except Exception as e:
-                    logger.error(f"Error in monitoring loop for {sandbox_id}: {e}")
-                    await asyncio.sleep(interval)
+        logger.info(f"Starting health monitoring for sandbox {sandbox_id}")
+        self._monitored[sandbox_id] = _MonitoredSandbox(
+            interval=interval,
+            auto_recover=auto_recover,
+            detailed_every=detailed_every,
+            next_due=time.monotonic()
+        )
         
-        # Start monitoring task
-        task = asyncio.create_task(monitor_loop())
-        self._monitoring_tasks[sandbox_id] = task
+        if self._scheduler_task is None or self._scheduler_task.done():
+            self._scheduler_task = asyncio.create_task(self._run_scheduler())
+        else:
+            # Let the scheduler pick up the new sandbox immediately
+            self._wakeup.set()
     
     async def stop_monitoring(self, sandbox_id: str):
         """Stop monitoring a sandbox."""
-        if sandbox_id in self._monitoring_tasks:
-            task = self._monitoring_tasks[sandbox_id]
-            task.cancel()
+        if self._monitored.pop(sandbox_id, None) is None:
+            return
+        
+        recovery = self._recoveries.pop(sandbox_id, None)
+        if recovery is not None:
+            recovery.cancel()
+        
+        if not self._monitored and self._scheduler_task is not None:
+            self._scheduler_task.cancel()
+            try:
+                await self._scheduler_task
+            except asyncio.CancelledError:
+                pass
+            self._scheduler_task = None
+            self._cancel_recoveries()
+        
+        logger.info(f"Stopped monitoring sandbox {sandbox_id}")
+    
+    def _cancel_recoveries(self):
+        """Cancel every recovery still running."""
+        recoveries, self._recoveries = self._recoveries, {}
+        for recovery in recoveries.values():
+            recovery.cancel()
+    
+    def _start_recovery(self, sandbox_id: str, report: SandboxHealthReport):
+        """Recover a sandbox in the background unless a recovery is already running."""
+        if sandbox_id in self._recoveries:
+            return
+        task = asyncio.create_task(self._handle_unhealthy_sandbox(sandbox_id, report))
+        self._recoveries[sandbox_id] = task
+        
+        def forget(done: asyncio.Task):
+            if self._recoveries.get(sandbox_id) is done:
+                del self._recoveries[sandbox_id]
+        task.add_done_callback(forget)
+    
+    async def _run_scheduler(self):
+        """Check due sandboxes in batches until none are monitored."""
+        try:
+            await self._schedule()
+        finally:
+            self._cancel_recoveries()
+    
+    async def _schedule(self):
+        while self._monitored:
+            self._wakeup.clear()
             try:
-                await task
+                now = time.monotonic()
+                due = {
+                    sandbox_id: monitored
+                    for sandbox_id, monitored in self._monitored.items()
+                    if monitored.next_due <= now
+                }
+                if due:
+                    await self._check_due(due)
             except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in sandbox monitoring scheduler: {e}")
+            
+            if not self._monitored:
+                break
+            
+            # Sleep until the next sandbox is due or a new one is added
+            next_due = min(monitored.next_due for monitored in self._monitored.values())
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    timeout=max(0.1, next_due - time.monotonic())
+                )
+            except asyncio.TimeoutError:
                 pass
-            del self._monitoring_tasks[sandbox_id]
-            logger.info(f"Stopped monitoring sandbox {sandbox_id}")
+    
+    async def _check_due(self, due: Dict[str, _MonitoredSandbox]):
+        """Health check a set of due sandboxes and act on the results."""
+        detailed_ids = []
+        basic_ids = []
+        for sandbox_id, monitored in due.items():
+            # Detailed probes on a fixed cadence, and whenever the sandbox
+            # wasn't STARTED last time (i.e. it may have just transitioned)
+            if (
+                monitored.cycle % monitored.detailed_every == 0
+                or monitored.last_state != SandboxState.STARTED
+            ):
+                detailed_ids.append(sandbox_id)
+            else:
+                basic_ids.append(sandbox_id)
+            monitored.cycle += 1
+        
+        # Both batches share the checker's concurrency limit, so the budget
+        # covers all due sandboxes rather than a fixed 10s
+        budget = self.health_checker.batch_budget(len(due))
+        detailed_reports, basic_reports = await asyncio.gather(
+            self.health_checker.batch_health_check(
+                detailed_ids, detailed=True, timeout=budget, use_cache=False
+            ),
+            self.health_checker.batch_health_check(
+                basic_ids, detailed=False, timeout=budget, use_cache=False
+            )
+        )
+        
+        finished_at = time.monotonic()
+        for sandbox_id, report in {**detailed_reports, **basic_reports}.items():
+            monitored = self._monitored.get(sandbox_id)
+            if monitored is None:
+                # Monitoring was stopped while the check was running
+                continue
+            if report.errors == [_BATCH_BUDGET_ERROR]:
+                # Never actually checked; leave it due so the next pass
+                # retries it instead of skipping a whole interval
+                continue
+            monitored.last_state = report.state
+            monitored.next_due = finished_at + monitored.interval
+            
+            # Handle unhealthy sandbox
+            if report.status == SandboxHealthStatus.UNHEALTHY and monitored.auto_recover:
+                self._start_recovery(sandbox_id, report)
+            elif report.status == SandboxHealthStatus.DEGRADED:
+                logger.warning(
+                    f"Sandbox {sandbox_id} is degraded: {report.warnings}"
+                )
+            
+            # Reset recovery attempts on healthy status
+            if report.status == SandboxHealthStatus.HEALTHY:
+                self._recovery_attempts[sandbox_id] = 0
     
     async def _handle_unhealthy_sandbox(
         self,
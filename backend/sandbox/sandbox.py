@@ -4,7 +4,13 @@ from utils.logger import logger
 from utils.config import config
 from utils.config import Configuration
 from sandbox.daytona_circuit_breaker import with_circuit_breaker, get_daytona_circuit_breaker
+from sandbox.health_check import get_health_checker
+import aiohttp
 import asyncio
+import shlex
+import time
+from types import MappingProxyType
+from typing import Dict, Optional, Set
 
 load_dotenv()
 
@@ -32,6 +38,57 @@ else:
 
 daytona = AsyncDaytona(daytona_config)
 
+# Size of the Daytona SDK's HTTP connection pool. Must stay well above
+# SandboxHealthChecker's batch concurrency (10) plus request-path traffic.
+DAYTONA_HTTP_POOL_SIZE = 100
+
+def _daytona_rest_client():
+    """The SDK's aiohttp-based REST client, or None if its layout changed."""
+    rest_client = getattr(getattr(daytona, "_api_client", None), "rest_client", None)
+    if not (hasattr(rest_client, "pool_manager") and hasattr(rest_client, "ssl_context")):
+        return None
+    return rest_client
+
+def configure_daytona_transport():
+    """
+    Give the Daytona SDK a tuned keep-alive HTTP session.
+    
+    The SDK lazily creates an aiohttp session with default keep-alive (15s),
+    so connections are dropped between periodic health checks. Installing the
+    session up front keeps connections and DNS results warm across polls.
+    Must be called from within the running event loop, before first use.
+    
+    This reaches into SDK internals as laid out in daytona-sdk 0.21.0 (pinned
+    in pyproject.toml), where the sandbox and toolbox APIs share one ApiClient,
+    so both use this session. If a future SDK moves the session, the SDK's
+    own default transport is left in place.
+    """
+    rest_client = _daytona_rest_client()
+    if rest_client is None:
+        logger.warning("Daytona SDK transport layout not recognised, using its default HTTP session")
+        return
+    if rest_client.pool_manager is not None:
+        return
+    rest_client.pool_manager = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=DAYTONA_HTTP_POOL_SIZE,
+            keepalive_timeout=75,
+            ttl_dns_cache=300,
+            ssl=rest_client.ssl_context,
+        ),
+        trust_env=True,
+    )
+
+async def close_daytona_transport():
+    """Close the Daytona SDK's HTTP session."""
+    if hasattr(daytona, "close"):
+        await daytona.close()
+        return
+    rest_client = _daytona_rest_client()
+    if rest_client is not None and rest_client.pool_manager is not None:
+        await rest_client.pool_manager.close()
+        rest_client.pool_manager = None
+
 @with_circuit_breaker("get_or_start_sandbox", timeout=15.0)
 async def get_or_start_sandbox(sandbox_id: str) -> AsyncSandbox:
     """Retrieve a sandbox by ID, check its state, and start it if needed."""
@@ -46,11 +103,10 @@ async def get_or_start_sandbox(sandbox_id: str) -> AsyncSandbox:
         if sandbox.state == SandboxState.ARCHIVED or sandbox.state == SandboxState.STOPPED:
             logger.info(f"Sandbox is in {sandbox.state} state. Starting...")
             try:
+                # start() polls refresh_data() until the sandbox reports
+                # "started", so the object is already current afterwards
+                # and needs no separate daytona.get()
                 await asyncio.wait_for(daytona.start(sandbox), timeout=30.0)
-                # Wait a moment for the sandbox to initialize
-                # sleep(5)
-                # Refresh sandbox state after starting
-                sandbox = await daytona.get(sandbox_id)
                 
                 # Start supervisord in a session when restarting
                 await start_supervisord_session(sandbox)
@@ -68,16 +124,29 @@ async def get_or_start_sandbox(sandbox_id: str) -> AsyncSandbox:
         logger.error(f"Error retrieving or starting sandbox: {str(e)}")
         raise e
 
-async def start_supervisord_session(sandbox: AsyncSandbox):
-    """Start supervisord in a session."""
+# Extra supervisord environment is saved here so that later restarts of the
+# sandbox (which don't know it) start supervisord with the same values
+_SUPERVISORD_ENV_FILE = "~/.supervisord.env"
+
+async def start_supervisord_session(sandbox: AsyncSandbox, env: Optional[Dict[str, str]] = None):
+    """Start supervisord in a session, optionally with extra environment variables."""
     session_id = "supervisord-session"
+    command = (
+        f"[ -f {_SUPERVISORD_ENV_FILE} ] && . {_SUPERVISORD_ENV_FILE}; "
+        "exec /usr/bin/supervisord -n -c /etc/supervisor/conf.d/supervisord.conf"
+    )
+    if env:
+        exports = "export " + " ".join(
+            f"{key}={shlex.quote(value)}" for key, value in env.items()
+        )
+        command = f"(umask 077; echo {shlex.quote(exports)} > {_SUPERVISORD_ENV_FILE}); " + command
     try:
         logger.info(f"Creating session {session_id} for supervisord")
         await sandbox.process.create_session(session_id)
         
         # Execute supervisord command
         await sandbox.process.execute_session_command(session_id, SessionExecuteRequest(
-            command="exec /usr/bin/supervisord -n -c /etc/supervisor/conf.d/supervisord.conf",
+            command=command,
             var_async=True
         ))
         logger.info(f"Supervisord started in session {session_id}")
@@ -85,10 +154,160 @@ async def start_supervisord_session(sandbox: AsyncSandbox):
         logger.error(f"Error starting supervisord session: {str(e)}")
         raise e
 
+# Settings shared by every sandbox we create; only the VNC password and
+# labels vary per call. Resources is a plain read-only holder, so one
+# instance can be reused across create requests.
+_BASE_ENV_VARS = MappingProxyType({
+    "CHROME_PERSISTENT_SESSION": "true",
+    "RESOLUTION": "1024x768x24",
+    "RESOLUTION_WIDTH": "1024",
+    "RESOLUTION_HEIGHT": "768",
+    "ANONYMIZED_TELEMETRY": "false",
+    "CHROME_PATH": "",
+    "CHROME_USER_DATA": "",
+    "CHROME_DEBUGGING_PORT": "9222",
+    "CHROME_DEBUGGING_HOST": "localhost",
+    "CHROME_CDP": ""
+})
+_BASE_RESOURCES = Resources(
+    cpu=4,
+    memory=8,
+    disk=10,
+)
+
+# Warm pool: idle sandboxes created ahead of time with supervisord not yet
+# started. On checkout they are labelled, given the normal auto-stop interval
+# and supervisord is started with the caller's VNC password, so creation
+# latency is paid off the request path.
+# Pooled sandboxes carry the WARM_POOL_LABELS and a long auto-stop interval,
+# so ones orphaned by a crashed process can be found and stop on their own.
+# Entries that may have auto-stopped are discarded on checkout; otherwise the
+# pool is only refilled after a checkout.
+# The pool lives in each API process: the number of idle sandboxes is
+# SANDBOX_WARM_POOL_SIZE times the number of worker processes.
+_AUTO_STOP_INTERVAL = 15
+_WARM_AUTO_STOP_INTERVAL = 60
+# Checked-out entries must have at least this much auto-stop time left
+_WARM_SANDBOX_MAX_AGE = (_WARM_AUTO_STOP_INTERVAL - 5) * 60
+WARM_POOL_LABELS = MappingProxyType({'warm_pool': '1'})
+_warm_pool: Optional[asyncio.Queue] = None
+_warm_pool_slots: Optional[asyncio.Semaphore] = None
+_warm_pool_task: Optional[asyncio.Task] = None
+_delete_tasks: Set[asyncio.Task] = set()
+
+def _log_delete_result(task: asyncio.Task, sandbox_id: str):
+    _delete_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Failed to delete warm sandbox {sandbox_id}: {task.exception()}")
+
+def _delete_in_background(sandbox: AsyncSandbox):
+    """Delete a sandbox without waiting, keeping the task referenced and logging failures."""
+    task = asyncio.create_task(daytona.delete(sandbox))
+    _delete_tasks.add(task)
+    task.add_done_callback(lambda t: _log_delete_result(t, sandbox.id))
+
+async def _fill_warm_pool():
+    """Keep the warm pool topped up to SANDBOX_WARM_POOL_SIZE."""
+    params = CreateSandboxFromSnapshotParams(
+        snapshot=Configuration.SANDBOX_SNAPSHOT_NAME,
+        public=True,
+        labels=dict(WARM_POOL_LABELS),
+        env_vars=dict(_BASE_ENV_VARS),
+        resources=_BASE_RESOURCES,
+        auto_stop_interval=_WARM_AUTO_STOP_INTERVAL,
+        auto_archive_interval=2 * 60,
+    )
+    
+    while True:
+        await _warm_pool_slots.acquire()
+        try:
+            sandbox = await asyncio.wait_for(daytona.create(params), timeout=60.0)
+            _warm_pool.put_nowait((time.monotonic(), sandbox))
+            logger.debug(f"Added sandbox {sandbox.id} to warm pool")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _warm_pool_slots.release()
+            logger.warning(f"Failed to create warm pool sandbox: {e}")
+            await asyncio.sleep(30)
+
+def _ensure_warm_pool():
+    """Start the warm pool filler on first use if the pool is enabled."""
+    global _warm_pool, _warm_pool_slots, _warm_pool_task
+    if config.SANDBOX_WARM_POOL_SIZE <= 0 or _warm_pool_task is not None:
+        return
+    _warm_pool = asyncio.Queue()
+    _warm_pool_slots = asyncio.Semaphore(config.SANDBOX_WARM_POOL_SIZE)
+    _warm_pool_task = asyncio.create_task(_fill_warm_pool())
+    logger.info(f"Started sandbox warm pool (size: {config.SANDBOX_WARM_POOL_SIZE} in this process)")
+
+async def _checkout_warm_sandbox(password: str, project_id: Optional[str]) -> Optional[AsyncSandbox]:
+    """Take a sandbox from the warm pool and configure it, or None if the pool is empty."""
+    _ensure_warm_pool()
+    if _warm_pool is None:
+        return None
+    
+    while True:
+        try:
+            created_at, sandbox = _warm_pool.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+        _warm_pool_slots.release()
+        
+        if time.monotonic() - created_at < _WARM_SANDBOX_MAX_AGE:
+            break
+        logger.debug(f"Discarding warm sandbox {sandbox.id} that may have auto-stopped")
+        _delete_in_background(sandbox)
+    
+    # The sandbox has left the pool: unless it is handed out, delete it, even
+    # if the caller is cancelled mid-way
+    try:
+        # Replaces the warm pool label, so orphan sweeps skip sandboxes in use
+        await sandbox.set_labels({'id': project_id} if project_id else {})
+        await sandbox.set_autostop_interval(_AUTO_STOP_INTERVAL)
+        await start_supervisord_session(sandbox, env={"VNC_PASSWORD": password})
+    except Exception as e:
+        logger.warning(f"Failed to prepare warm sandbox {sandbox.id}, creating a new one: {e}")
+        _delete_in_background(sandbox)
+        return None
+    except BaseException:
+        _delete_in_background(sandbox)
+        raise
+    
+    logger.debug(f"Using warm sandbox {sandbox.id}")
+    return sandbox
+
+async def close_warm_pool():
+    """Stop refilling the warm pool and delete the idle sandboxes in it."""
+    global _warm_pool_task
+    if _warm_pool_task is None:
+        return
+    
+    _warm_pool_task.cancel()
+    try:
+        await _warm_pool_task
+    except asyncio.CancelledError:
+        pass
+    _warm_pool_task = None
+    
+    while not _warm_pool.empty():
+        _, sandbox = _warm_pool.get_nowait()
+        try:
+            await daytona.delete(sandbox)
+        except Exception as e:
+            logger.warning(f"Failed to delete warm sandbox {sandbox.id}: {e}")
+    
+    if _delete_tasks:
+        await asyncio.gather(*_delete_tasks, return_exceptions=True)
+
 @with_circuit_breaker("create_sandbox", timeout=30.0)
 async def create_sandbox(password: str, project_id: str = None) -> AsyncSandbox:
     """Create a new sandbox with all required services configured and running."""
     
+    sandbox = await _checkout_warm_sandbox(password, project_id)
+    if sandbox is not None:
+        return sandbox
+    
     logger.debug("Creating new Daytona sandbox environment")
     logger.debug("Configuring sandbox with snapshot and environment variables")
     
@@ -101,25 +320,9 @@ async def create_sandbox(password: str, project_id: str = None) -> AsyncSandbox:
         snapshot=Configuration.SANDBOX_SNAPSHOT_NAME,
         public=True,
         labels=labels,
-        env_vars={
-            "CHROME_PERSISTENT_SESSION": "true",
-            "RESOLUTION": "1024x768x24",
-            "RESOLUTION_WIDTH": "1024",
-            "RESOLUTION_HEIGHT": "768",
-            "VNC_PASSWORD": password,
-            "ANONYMIZED_TELEMETRY": "false",
-            "CHROME_PATH": "",
-            "CHROME_USER_DATA": "",
-            "CHROME_DEBUGGING_PORT": "9222",
-            "CHROME_DEBUGGING_HOST": "localhost",
-            "CHROME_CDP": ""
-        },
-        resources=Resources(
-            cpu=4,
-            memory=8,
-            disk=10,
-        ),
-        auto_stop_interval=15,
+        env_vars={**_BASE_ENV_VARS, "VNC_PASSWORD": password},
+        resources=_BASE_RESOURCES,
+        auto_stop_interval=_AUTO_STOP_INTERVAL,
         auto_archive_interval=2 * 60,
     )
     
@@ -148,6 +351,11 @@ async def delete_sandbox(sandbox_id: str) -> bool:
         # Delete the sandbox
         await daytona.delete(sandbox)
         
+        # Don't serve a stale health report for a sandbox that no longer exists
+        health_checker = get_health_checker()
+        if health_checker:
+            health_checker.invalidate(sandbox_id)
+        
         logger.info(f"Successfully deleted sandbox {sandbox_id}")
         return True
     except Exception as e:
@@ -1,193 +1,443 @@
-from typing import Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+import functools
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
 import uuid
 import asyncio
+import random
+import re
 import time
 
 from agentpress.thread_manager import ThreadManager
 from agentpress.tool import Tool
-from daytona_sdk import AsyncSandbox
+from daytona_sdk import AsyncSandbox, DaytonaError
 from sandbox.sandbox import get_or_start_sandbox, create_sandbox, delete_sandbox
 from sandbox.daytona_health import daytona_pre_flight_check, get_daytona_health_checker
+from sandbox.daytona_circuit_breaker import get_daytona_circuit_breaker
 from utils.logger import logger
 from utils.files_utils import clean_path
-from utils.error_handler import SandboxError, TransientError
+from utils.error_handler import KortixError, SandboxError, TransientError
+
+T = TypeVar("T")
+
+# Tools clean the same handful of paths over and over
+_clean_path_cached = functools.lru_cache(maxsize=4096)(clean_path)
+
+# Process-wide LRU cache of each project's sandbox metadata (the `sandbox`
+# column of `projects`), so tool instances for the same project don't each
+# query the database. Entries expire after _PROJECT_SANDBOX_CACHE_TTL.
+_PROJECT_SANDBOX_CACHE_TTL = 300
+_PROJECT_SANDBOX_CACHE_SIZE = 1024
+_project_sandbox_cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+
+def _get_cached_sandbox_info(project_id: str) -> Optional[dict]:
+    """Return the cached sandbox metadata for a project, if fresh."""
+    entry = _project_sandbox_cache.get(project_id)
+    if entry is None:
+        return None
+    sandbox_info, expires_at = entry
+    if expires_at <= time.monotonic():
+        del _project_sandbox_cache[project_id]
+        return None
+    _project_sandbox_cache.move_to_end(project_id)
+    return sandbox_info
+
+def _cache_sandbox_info(project_id: str, sandbox_info: dict):
+    """Cache a project's sandbox metadata, evicting the least recently used entry if full."""
+    _project_sandbox_cache[project_id] = (sandbox_info, time.monotonic() + _PROJECT_SANDBOX_CACHE_TTL)
+    _project_sandbox_cache.move_to_end(project_id)
+    if len(_project_sandbox_cache) > _PROJECT_SANDBOX_CACHE_SIZE:
+        _project_sandbox_cache.popitem(last=False)
+
+def invalidate_project_sandbox_cache(project_id: str):
+    """Drop the cached sandbox metadata for a project."""
+    _project_sandbox_cache.pop(project_id, None)
+
+class _ProjectSandboxLoader:
+    """Batches project sandbox lookups made in the same event loop tick into one query."""
+
+    def __init__(self):
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._dispatch_task: Optional[asyncio.Task] = None
+
+    async def load(self, client, project_id: str) -> Optional[dict]:
+        """Return the project's row (project_id and sandbox), or None if it doesn't exist."""
+        future = self._pending.get(project_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[project_id] = future
+            if self._dispatch_task is None:
+                self._dispatch_task = asyncio.create_task(self._dispatch(client))
+        return await future
+
+    async def _dispatch(self, client):
+        # Let every lookup scheduled in this tick enqueue first
+        await asyncio.sleep(0)
+        pending, self._pending = self._pending, {}
+        self._dispatch_task = None
+
+        try:
+            result = await client.table('projects').select('project_id, sandbox').in_('project_id', list(pending)).execute()
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        rows = {row['project_id']: row for row in result.data or []}
+        for project_id, future in pending.items():
+            if not future.done():
+                future.set_result(rows.get(project_id))
+
+_project_loader = _ProjectSandboxLoader()
+
+# When each sandbox was last reached successfully (monotonic time), and the
+# entry that lookup produced. Within _REUSE_SANDBOX_WINDOW of that the entry
+# is reused as is; within _TRUSTED_SANDBOX_WINDOW the lookup skips the
+# pre-flight check and retries.
+_REUSE_SANDBOX_WINDOW = 10
+_TRUSTED_SANDBOX_WINDOW = 30
+_sandbox_last_ok: Dict[str, Tuple[float, "_SandboxEntry"]] = {}
+
+def _recent_sandbox(sandbox_id: str, window: float) -> Optional["_SandboxEntry"]:
+    """The entry of the sandbox's last successful lookup, if within `window` seconds."""
+    record = _sandbox_last_ok.get(sandbox_id)
+    if record is None or time.monotonic() - record[0] >= window:
+        return None
+    return record[1]
+
+def _mark_sandbox_ok(entry: "_SandboxEntry"):
+    """Record a successful sandbox lookup, dropping expired records when there are many."""
+    now = time.monotonic()
+    _sandbox_last_ok[entry.sandbox_id] = (now, entry)
+    if len(_sandbox_last_ok) > _PROJECT_SANDBOX_CACHE_SIZE:
+        for stale_id in [sid for sid, (last_ok, _) in _sandbox_last_ok.items() if now - last_ok >= _TRUSTED_SANDBOX_WINDOW]:
+            del _sandbox_last_ok[stale_id]
+
+@dataclass(slots=True)
+class PreviewLink:
+    """URL and access token of a sandbox preview link."""
+    url: Optional[str] = None
+    token: Optional[str] = None
+
+_PREVIEW_REPR = re.compile(r"url='([^']*)'(?:.*token='([^']*)')?")
+
+def _to_preview(link, sandbox_id: str) -> PreviewLink:
+    """Normalize a get_preview_link result; empty if it failed or can't be parsed."""
+    if isinstance(link, BaseException):
+        logger.warning(f"Failed to get preview link for sandbox {sandbox_id}: {link}")
+        return PreviewLink()
+    url = getattr(link, 'url', None)
+    if url is not None:
+        return PreviewLink(url, getattr(link, 'token', None))
+
+    # Fall back to parsing the repr of objects without the attributes
+    match = _PREVIEW_REPR.search(str(link))
+    if match is None:
+        logger.warning(f"Failed to extract preview link for sandbox {sandbox_id}: {link!r}")
+        return PreviewLink()
+    return PreviewLink(match.group(1), match.group(2))
+
+# Errors worth retrying regardless of their message (asyncio.TimeoutError is
+# an OSError too, but _retry handles it separately)
+RETRIABLE = (ConnectionError, OSError)
+
+def _is_retriable(error: Exception) -> bool:
+    """Whether a failed sandbox call might succeed if simply tried again."""
+    if isinstance(error, SandboxError) and get_daytona_circuit_breaker().is_open():
+        # Rejected by the open circuit; it stays open past any backoff here
+        return False
+    if isinstance(error, KortixError):
+        return error.context.can_retry
+    if isinstance(error, RETRIABLE):
+        return True
+    if isinstance(error, DaytonaError):
+        # The SDK re-raises API errors as DaytonaError without a status; the
+        # original exception is still on __context__. 4xx responses other
+        # than 429 won't change on retry.
+        status = getattr(error.__context__, 'status', None)
+        return status is None or status == 429 or status >= 500
+    return False
+
+async def _retry(
+    op: Callable[[], Awaitable[T]],
+    *,
+    description: str,
+    timeout_message: str,
+    attempt_timeout: float,
+    max_retries: int = 3,
+    base: float = 1.0,
+    cap: float = 30.0
+) -> T:
+    """Run op(), retrying failures with jittered exponential backoff.
+
+    Each attempt is limited to attempt_timeout seconds.
+
+    A timeout on the last attempt raises TransientError(timeout_message);
+    any other error on the last attempt, or any error that isn't retriable
+    (see _is_retriable), is re-raised. No delay follows the last attempt.
+    """
+    for attempt in range(max_retries):
+        last_attempt = attempt == max_retries - 1
+        try:
+            if attempt:
+                logger.info("%s (attempt %d/%d)", description, attempt + 1, max_retries)
+            async with asyncio.timeout(attempt_timeout):
+                return await op()
+        except asyncio.TimeoutError:
+            if last_attempt:
+                raise TransientError(timeout_message)
+            reason = "timed out"
+        except Exception as e:
+            if last_attempt or not _is_retriable(e):
+                raise
+            reason = f"failed: {e}"
+
+        # Jitter keeps tools that failed together from retrying in lockstep
+        delay = min(cap, base * 2 ** attempt) * (1 + random.random() * 0.5)
+        logger.warning("%s %s, retrying in %.1fs...", description, reason, delay)
+        await asyncio.sleep(delay)
+
+async def _persist_sandbox_metadata(client, project_id: str, sandbox_obj: AsyncSandbox, sandbox_pass: str):
+    """Store a newly created sandbox's metadata on its project.
+
+    Runs before the sandbox is handed to any caller. If the metadata can't
+    be stored the sandbox is deleted, since the project would otherwise
+    never find it again. Cancellation (e.g. shutdown) leaves it alone.
+    """
+    sandbox_id = sandbox_obj.id
+    try:
+        # Gather preview links and token concurrently (best-effort
+        # parsing; a failed link leaves its fields None)
+        vnc_link, website_link = await asyncio.gather(
+            sandbox_obj.get_preview_link(6080),
+            sandbox_obj.get_preview_link(8080),
+            return_exceptions=True
+        )
+        vnc_preview = _to_preview(vnc_link, sandbox_id)
+        website_preview = _to_preview(website_link, sandbox_id)
+
+        sandbox_info = {
+            'id': sandbox_id,
+            'pass': sandbox_pass,
+            'vnc_preview': vnc_preview.url,
+            'sandbox_url': website_preview.url,
+            'token': vnc_preview.token
+        }
+
+        async def update():
+            update_result = await client.table('projects').update({
+                'sandbox': sandbox_info
+            }).eq('project_id', project_id).execute()
+            if not update_result.data:
+                raise TransientError("Database update failed when storing sandbox metadata")
+
+        await _retry(
+            update,
+            attempt_timeout=10.0,
+            description=f"Storing metadata for sandbox {sandbox_id}",
+            timeout_message=f"Storing metadata for sandbox {sandbox_id} timed out after multiple attempts"
+        )
+        _cache_sandbox_info(project_id, sandbox_info)
+    except Exception:
+        logger.error(f"Failed to store metadata for sandbox {sandbox_id} of project {project_id}; deleting it", exc_info=True)
+        invalidate_project_sandbox_cache(project_id)
+        await _discard_sandbox(sandbox_id)
+        raise
+
+async def _discard_sandbox(sandbox_id: str):
+    """Best-effort delete of a sandbox that its project doesn't record."""
+    try:
+        await delete_sandbox(sandbox_id)
+    except Exception:
+        logger.error(f"Failed to delete sandbox {sandbox_id} after failing to store its metadata", exc_info=True)
+
+@dataclass(slots=True)
+class _SandboxEntry:
+    """A project's sandbox as resolved by SandboxToolsBase._load_sandbox."""
+    sandbox_id: str
+    sandbox_pass: Optional[str]
+    sandbox: AsyncSandbox
 
 class SandboxToolsBase(Tool):
     """Base class for all sandbox tools that provides project-based sandbox access."""
     
     # Class variable to track if sandbox URLs have been printed
     _urls_printed = False
+
+    # Sandbox lookups in flight, keyed by project_id. Tool instances for the
+    # same project await the same lookup instead of each getting/creating one.
+    _sandbox_tasks: Dict[str, asyncio.Task] = {}
     
     def __init__(self, project_id: str, thread_manager: Optional[ThreadManager] = None):
         super().__init__()
         self.project_id = project_id
         self.thread_manager = thread_manager
         self.workspace_path = "/workspace"
-        self._sandbox = None
-        self._sandbox_id = None
-        self._sandbox_pass = None
+        # Shared by all instances whose lookup resolved to the same sandbox
+        self._sandbox_entry: Optional[_SandboxEntry] = None
 
     async def _ensure_sandbox(self) -> AsyncSandbox:
         """Ensure we have a valid sandbox instance, retrieving it from the project if needed.
 
         If the project does not yet have a sandbox, create it lazily and persist
         the metadata to the `projects` table so subsequent calls can reuse it.
+        Concurrent calls for the same project share a single lookup.
+        """
+        if self._sandbox_entry is None:
+            # While Daytona's circuit breaker is open every call would be
+            # rejected anyway; skip the pre-flight check and retries
+            project_id = self.project_id
+            if get_daytona_circuit_breaker().is_open():
+                logger.warning(f"Daytona circuit breaker is open; no sandbox for project {project_id}")
+                return None
+
+            task = SandboxToolsBase._sandbox_tasks.get(project_id)
+            if task is None:
+                task = asyncio.create_task(self._load_sandbox())
+                SandboxToolsBase._sandbox_tasks[project_id] = task
+                task.add_done_callback(lambda _: SandboxToolsBase._sandbox_tasks.pop(project_id, None))
+
+            # Shielded so a cancelled caller doesn't abort the lookup for the others
+            entry = await asyncio.shield(task)
+            if entry is None:
+                return None
+            self._sandbox_entry = entry
+
+        return self._sandbox_entry.sandbox
+
+    async def _load_sandbox(self) -> Optional[_SandboxEntry]:
+        """Retrieve or lazily create the project's sandbox.
+
+        Returns None if the sandbox service is unavailable.
         """
-        if self._sandbox is None:
-            # Pre-flight check for Daytona service
+        project_id = self.project_id
+
+        # Fast paths: a sandbox reached moments ago is reused without any
+        # call; one reached a little longer ago gets a single attempt,
+        # without the pre-flight check or retries
+        sandbox_info = _get_cached_sandbox_info(project_id)
+        if sandbox_info is not None:
+            sandbox_id = sandbox_info['id']
+            entry = _recent_sandbox(sandbox_id, _REUSE_SANDBOX_WINDOW)
+            if entry is not None:
+                return entry
+            if _recent_sandbox(sandbox_id, _TRUSTED_SANDBOX_WINDOW) is not None:
+                try:
+                    sandbox_obj = await _retry(
+                        lambda: get_or_start_sandbox(sandbox_id),
+                        attempt_timeout=10.0,
+                        max_retries=1,
+                        description=f"Getting sandbox {sandbox_id}",
+                        timeout_message=f"Getting sandbox {sandbox_id} timed out"
+                    )
+                    entry = _SandboxEntry(sandbox_id, sandbox_info.get('pass'), sandbox_obj)
+                    _mark_sandbox_ok(entry)
+                    return entry
+                except Exception as e:
+                    logger.warning(f"Fast path for sandbox {sandbox_id} failed, retrying normally: {e}")
+
+        # Pre-flight check for Daytona service, unless a recent check passed
+        if not get_daytona_health_checker().last_ok_within(10):
             is_healthy, error_msg = await daytona_pre_flight_check()
             if not is_healthy:
                 logger.error(f"Daytona service is not healthy: {error_msg}")
                 raise SandboxError(f"Cannot create sandbox: {error_msg}")
-            
-            try:
-                # Get database client
+        
+        try:
+            # Get the project's sandbox metadata, from the cache if possible.
+            # The database client is only needed on a miss or to create one.
+            sandbox_info = _get_cached_sandbox_info(project_id)
+            if sandbox_info is None:
                 client = await self.thread_manager.db.client
+                project = await _project_loader.load(client, project_id)
+                if project is None:
+                    raise ValueError(f"Project {project_id} not found")
+
+                sandbox_info = project.get('sandbox') or {}
+                if sandbox_info.get('id'):
+                    _cache_sandbox_info(project_id, sandbox_info)
+
+            # If there is no sandbox recorded for this project, create one lazily
+            if not sandbox_info.get('id'):
+                logger.info(f"No sandbox recorded for project {project_id}; creating lazily")
+                sandbox_pass = str(uuid.uuid4())
+                
+                # Retry sandbox creation with exponential backoff
+                sandbox_obj = await _retry(
+                    lambda: create_sandbox(sandbox_pass, project_id),
+                    attempt_timeout=15.0,  # 15 second timeout for creation
+                    description="Creating sandbox",
+                    timeout_message="Sandbox creation timed out after multiple attempts",
+                    base=2.0
+                )
+                if not sandbox_obj:
+                    raise SandboxError("Failed to create sandbox after all retries")
+                sandbox_id = sandbox_obj.id
+                logger.debug("Successfully created sandbox %s", sandbox_id)
+
+                # Record the sandbox on the project before anyone uses it, so
+                # a failed write can't leave callers holding a deleted sandbox
+                try:
+                    client = await self.thread_manager.db.client
+                except Exception:
+                    await _discard_sandbox(sandbox_id)
+                    raise
+                await _persist_sandbox_metadata(client, project_id, sandbox_obj, sandbox_pass)
 
-                # Get project data
-                project = await client.table('projects').select('*').eq('project_id', self.project_id).execute()
-                if not project.data or len(project.data) == 0:
-                    raise ValueError(f"Project {self.project_id} not found")
-
-                project_data = project.data[0]
-                sandbox_info = project_data.get('sandbox') or {}
-
-                # If there is no sandbox recorded for this project, create one lazily
-                if not sandbox_info.get('id'):
-                    logger.info(f"No sandbox recorded for project {self.project_id}; creating lazily")
-                    sandbox_pass = str(uuid.uuid4())
-                    
-                    # Retry sandbox creation with exponential backoff
-                    max_retries = 3
-                    retry_delay = 2.0
-                    sandbox_obj = None
-                    
-                    for attempt in range(max_retries):
-                        try:
-                            logger.info(f"Creating sandbox (attempt {attempt + 1}/{max_retries})")
-                            sandbox_obj = await asyncio.wait_for(
-                                create_sandbox(sandbox_pass, self.project_id),
-                                timeout=15.0  # 15 second timeout for creation
-                            )
-                            sandbox_id = sandbox_obj.id
-                            logger.info(f"Successfully created sandbox {sandbox_id}")
-                            break
-                        except asyncio.TimeoutError:
-                            if attempt < max_retries - 1:
-                                logger.warning(f"Sandbox creation timed out, retrying in {retry_delay}s...")
-                                await asyncio.sleep(retry_delay)
-                                retry_delay *= 2  # Exponential backoff
-                            else:
-                                raise TransientError("Sandbox creation timed out after multiple attempts")
-                        except Exception as e:
-                            if attempt < max_retries - 1:
-                                logger.warning(f"Sandbox creation failed: {e}, retrying in {retry_delay}s...")
-                                await asyncio.sleep(retry_delay)
-                                retry_delay *= 2
-                            else:
-                                raise
-                    
-                    if not sandbox_obj:
-                        raise SandboxError("Failed to create sandbox after all retries")
-
-                    # Gather preview links and token (best-effort parsing)
-                    try:
-                        vnc_link = await sandbox_obj.get_preview_link(6080)
-                        website_link = await sandbox_obj.get_preview_link(8080)
-                        vnc_url = vnc_link.url if hasattr(vnc_link, 'url') else str(vnc_link).split("url='")[1].split("'")[0]
-                        website_url = website_link.url if hasattr(website_link, 'url') else str(website_link).split("url='")[1].split("'")[0]
-                        token = vnc_link.token if hasattr(vnc_link, 'token') else (str(vnc_link).split("token='")[1].split("'")[0] if "token='" in str(vnc_link) else None)
-                    except Exception:
-                        # If preview link extraction fails, still proceed but leave fields None
-                        logger.warning(f"Failed to extract preview links for sandbox {sandbox_id}", exc_info=True)
-                        vnc_url = None
-                        website_url = None
-                        token = None
-
-                    # Persist sandbox metadata to project record
-                    update_result = await client.table('projects').update({
-                        'sandbox': {
-                            'id': sandbox_id,
-                            'pass': sandbox_pass,
-                            'vnc_preview': vnc_url,
-                            'sandbox_url': website_url,
-                            'token': token
-                        }
-                    }).eq('project_id', self.project_id).execute()
-
-                    if not update_result.data:
-                        # Cleanup created sandbox if DB update failed
-                        try:
-                            await delete_sandbox(sandbox_id)
-                        except Exception:
-                            logger.error(f"Failed to delete sandbox {sandbox_id} after DB update failure", exc_info=True)
-                        raise Exception("Database update failed when storing sandbox metadata")
-
-                    # Store local metadata and ensure sandbox is ready
-                    self._sandbox_id = sandbox_id
-                    self._sandbox_pass = sandbox_pass
-                    self._sandbox = await get_or_start_sandbox(self._sandbox_id)
-                else:
-                    # Use existing sandbox metadata
-                    self._sandbox_id = sandbox_info['id']
-                    self._sandbox_pass = sandbox_info.get('pass')
-                    
-                    # Retry getting existing sandbox with timeout
-                    max_retries = 3
-                    retry_delay = 1.0
-                    
-                    for attempt in range(max_retries):
-                        try:
-                            logger.info(f"Getting sandbox {self._sandbox_id} (attempt {attempt + 1}/{max_retries})")
-                            self._sandbox = await asyncio.wait_for(
-                                get_or_start_sandbox(self._sandbox_id),
-                                timeout=10.0  # 10 second timeout for getting existing sandbox
-                            )
-                            logger.info(f"Successfully connected to sandbox {self._sandbox_id}")
-                            break
-                        except asyncio.TimeoutError:
-                            if attempt < max_retries - 1:
-                                logger.warning(f"Getting sandbox timed out, retrying in {retry_delay}s...")
-                                await asyncio.sleep(retry_delay)
-                                retry_delay *= 2
-                            else:
-                                raise TransientError(f"Failed to connect to sandbox {self._sandbox_id} after multiple attempts")
-                        except Exception as e:
-                            if attempt < max_retries - 1:
-                                logger.warning(f"Failed to get sandbox: {e}, retrying in {retry_delay}s...")
-                                await asyncio.sleep(retry_delay)
-                                retry_delay *= 2
-                            else:
-                                raise
-
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Error retrieving/creating sandbox for project {self.project_id}: {error_msg}", exc_info=True)
+                # create_sandbox already returns a started sandbox with
+                # supervisord running, so no get_or_start is needed
+                entry = _SandboxEntry(sandbox_id, sandbox_pass, sandbox_obj)
+                _mark_sandbox_ok(entry)
+                return entry
+            else:
+                # Use existing sandbox metadata
+                sandbox_id = sandbox_info['id']
                 
-                # If sandbox service is unavailable, return None to allow tools to handle it
-                if "timed out" in error_msg.lower() or "daytona" in error_msg.lower():
-                    logger.warning(f"Sandbox service appears to be unavailable - tools may have limited functionality")
-                    return None
-                raise e
+                # Retry getting existing sandbox with timeout
+                try:
+                    sandbox_obj = await _retry(
+                        lambda: get_or_start_sandbox(sandbox_id),
+                        attempt_timeout=10.0,  # 10 second timeout for getting existing sandbox
+                        description=f"Getting sandbox {sandbox_id}",
+                        timeout_message=f"Failed to connect to sandbox {sandbox_id} after multiple attempts"
+                    )
+                except Exception:
+                    # The cached metadata may point at a sandbox that no
+                    # longer exists; re-read it next time
+                    invalidate_project_sandbox_cache(project_id)
+                    raise
+                logger.debug("Successfully connected to sandbox %s", sandbox_id)
+                entry = _SandboxEntry(sandbox_id, sandbox_info.get('pass'), sandbox_obj)
+                _mark_sandbox_ok(entry)
+                return entry
 
-        return self._sandbox
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Error retrieving/creating sandbox for project {project_id}: {error_msg}", exc_info=True)
+            
+            # If sandbox service is unavailable, return None to allow tools to handle it
+            if "timed out" in error_msg.lower() or "daytona" in error_msg.lower():
+                logger.warning(f"Sandbox service appears to be unavailable - tools may have limited functionality")
+                return None
+            raise e
 
     @property
     def sandbox(self) -> AsyncSandbox:
         """Get the sandbox instance, ensuring it exists."""
-        if self._sandbox is None:
+        if self._sandbox_entry is None:
             raise RuntimeError("Sandbox not initialized. Call _ensure_sandbox() first.")
-        return self._sandbox
+        return self._sandbox_entry.sandbox
 
     @property
     def sandbox_id(self) -> str:
         """Get the sandbox ID, ensuring it exists."""
-        if self._sandbox_id is None:
+        if self._sandbox_entry is None:
             raise RuntimeError("Sandbox ID not initialized. Call _ensure_sandbox() first.")
-        return self._sandbox_id
+        return self._sandbox_entry.sandbox_id
 
     def clean_path(self, path: str) -> str:
         """Clean and normalize a path to be relative to /workspace."""
-        cleaned_path = clean_path(path, self.workspace_path)
-        logger.debug(f"Cleaned path: {path} -> {cleaned_path}")
+        cleaned_path = _clean_path_cached(path, self.workspace_path)
+        logger.debug("Cleaned path: %s -> %s", path, cleaned_path)
         return cleaned_path
\ No newline at end of file
@@ -14,7 +14,7 @@ from typing import Union, Dict, Any, Optional, AsyncGenerator, List
 import os
 import json
 import asyncio
-import uuid
+import secrets
 from openai import OpenAIError
 import litellm
 from litellm.files.main import ModelResponse
@@ -328,7 +328,7 @@ async def make_llm_api_call(
         LLMError: For other API-related errors
     """
     # Generate unique request ID
-    request_id = str(uuid.uuid4())
+    request_id = secrets.token_hex(8)
     
     logger.info(
         f"Making LLM API call to model: {model_name} "
@@ -11,6 +11,8 @@ This module provides intelligent retry logic for LLM API calls with:
 """
 
 import asyncio
+import functools
+import heapq
 import time
 import json
 from enum import Enum
@@ -19,7 +21,7 @@ from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
 import random
 import weakref
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict, deque
 import litellm
 
 from utils.logger import logger
@@ -30,6 +32,66 @@ from utils.error_handler import (
 
 T = TypeVar('T')
 
+# Per-request attempt history is capped so huge provider error bodies and
+# long fallback walks can't grow a context without bound
+_HISTORY_LENGTH = 8
+_MAX_ERROR_LENGTH = 512
+
+# In-flight request tracking; entries left behind by abandoned requests are
+# evicted by size and age
+_ACTIVE_REQUESTS_MAX = 10_000
+_ACTIVE_REQUESTS_TTL = 3600
+
+
+# Circuit breaker defaults shared by RetryConfig and standalone ModelMetrics
+_DEFAULT_FAILURE_THRESHOLD = 5
+_DEFAULT_FAILURE_WINDOW = 60.0
+
+# Cost charged when a response carries no usage information
+_FALLBACK_COST = 0.001
+
+
+def _usage_attribute_cost(result: Any, cost_per_token: float) -> float:
+    """Cost of a response object exposing ``.usage`` (litellm ModelResponse)."""
+    usage = getattr(result, 'usage', None)
+    if not usage:
+        return _FALLBACK_COST
+    total_tokens = (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+    return (total_tokens / 1000) * cost_per_token
+
+
+def _usage_key_cost(result: Dict[str, Any], cost_per_token: float) -> float:
+    """Cost of a dict response with a ``usage`` key."""
+    usage = result.get('usage')
+    if not usage:
+        return _FALLBACK_COST
+    total_tokens = (usage.get('prompt_tokens') or 0) + (usage.get('completion_tokens') or 0)
+    return (total_tokens / 1000) * cost_per_token
+
+
+def _no_usage_cost(result: Any, cost_per_token: float) -> float:
+    """Cost of a response type that never reports usage (e.g. streams)."""
+    return _FALLBACK_COST
+
+
+# Cost extractor per response class, chosen the first time each class is seen
+_COST_EXTRACTORS: Dict[type, Callable[[Any, float], float]] = {}
+
+
+def _cost_extractor(result: Any) -> Callable[[Any, float], float]:
+    """Pick and cache the cost extractor for the result's class."""
+    result_type = type(result)
+    extractor = _COST_EXTRACTORS.get(result_type)
+    if extractor is None:
+        if isinstance(result, dict):
+            extractor = _usage_key_cost
+        elif hasattr(result, 'usage'):
+            extractor = _usage_attribute_cost
+        else:
+            extractor = _no_usage_cost
+        _COST_EXTRACTORS[result_type] = extractor
+    return extractor
+
 
 class RequestPriority(Enum):
     """Priority levels for LLM requests."""
@@ -39,6 +101,17 @@ class RequestPriority(Enum):
     CRITICAL = 4
 
 
+class CircuitState(Enum):
+    """Per-model circuit breaker states."""
+    CLOSED = "closed"        # Normal operation
+    OPEN = "open"            # Model is failing, calls are rejected
+    HALF_OPEN = "half_open"  # Cooldown elapsed, a single probe is allowed
+
+
+class CircuitOpenError(TransientError):
+    """Raised instead of calling a model whose circuit is open."""
+
+
 class ModelTier(Enum):
     """Model tiers based on capability and cost."""
     PREMIUM = "premium"      # Claude 3.7, GPT-5, etc.
@@ -47,7 +120,16 @@ class ModelTier(Enum):
     FALLBACK = "fallback"    # Cheapest available models
 
 
-@dataclass
+# Order in which tiers are considered for additional fallbacks
+_TIER_RANK = {
+    ModelTier.PREMIUM: 0,
+    ModelTier.STANDARD: 1,
+    ModelTier.EFFICIENT: 2,
+    ModelTier.FALLBACK: 3,
+}
+
+
+@dataclass(slots=True)
 class ModelConfig:
     """Configuration for a specific model."""
     name: str
@@ -60,7 +142,7 @@ class ModelConfig:
     fallback_models: List[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class RetryConfig:
     """Configuration for retry behavior."""
     max_attempts: int = 3
@@ -76,9 +158,23 @@ class RetryConfig:
     timeout_retry_count: int = 2
     billing_retry_count: int = 0  # Don't retry billing errors
     network_retry_count: int = 3
+    
+    # Per-model circuit breaker
+    circuit_failure_threshold: int = _DEFAULT_FAILURE_THRESHOLD  # Failures before opening
+    circuit_cooldown: float = 30.0       # Seconds before a HALF_OPEN probe
+    circuit_success_threshold: int = 2   # HALF_OPEN successes needed to close
+    window_seconds: float = _DEFAULT_FAILURE_WINDOW  # Failures older than this are forgotten
+    
+    # Queue scheduling: probability of serving the highest priority request;
+    # otherwise the oldest pending request is served so LOW never starves
+    priority_bias: float = 0.9
+    
+    # Total spend across all requests after which new requests are refused
+    # (None disables the ceiling)
+    global_cost_ceiling: Optional[float] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class RequestContext:
     """Context for a specific request."""
     request_id: str
@@ -90,11 +186,16 @@ class RequestContext:
     created_at: float
     attempt_count: int = 0
     total_cost: float = 0.0
-    model_history: List[str] = field(default_factory=list)
-    error_history: List[str] = field(default_factory=list)
+    model_history: deque = field(default_factory=lambda: deque(maxlen=_HISTORY_LENGTH))
+    error_history: deque = field(default_factory=lambda: deque(maxlen=_HISTORY_LENGTH))
+    # Input + expected output tokens; the messages are identical for every
+    # model in the fallback chain, so this is estimated once per request
+    estimated_tokens: int = 0
+    # Previous network backoff, for decorrelated jitter (0 = none yet)
+    prev_delay: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class ModelMetrics:
     """Performance metrics for a model."""
     total_requests: int = 0
@@ -103,15 +204,28 @@ class ModelMetrics:
     average_latency: float = 0.0
     average_cost: float = 0.0
     last_failure_time: Optional[float] = None
-    consecutive_failures: int = 0
+    last_success_time: Optional[float] = None
     rate_limit_count: int = 0
     success_rate: float = 100.0
     
+    # Monotonic times of recent breaker-relevant failures, trimmed to window_seconds
+    window_seconds: float = _DEFAULT_FAILURE_WINDOW
+    failure_timestamps: deque = field(
+        default_factory=lambda: deque(maxlen=_DEFAULT_FAILURE_THRESHOLD)
+    )
+    
+    @property
+    def consecutive_failures(self) -> int:
+        """Failures since the last success that fall inside the window."""
+        self._trim_failures(time.monotonic())
+        return len(self.failure_timestamps)
+    
     def update_success(self, latency: float, cost: float):
         """Update metrics for successful request."""
         self.total_requests += 1
         self.successful_requests += 1
-        self.consecutive_failures = 0
+        self.failure_timestamps.clear()
+        self.last_success_time = time.monotonic()
         
         # Update averages using exponential moving average
         alpha = 0.1
@@ -124,22 +238,64 @@ class ModelMetrics:
         
         self._update_success_rate()
     
-    def update_failure(self, error_type: str):
+    def update_failure(self, error_type: str, counts_toward_breaker: bool = True):
         """Update metrics for failed request."""
         self.total_requests += 1
         self.failed_requests += 1
-        self.consecutive_failures += 1
-        self.last_failure_time = time.time()
+        self.last_failure_time = time.monotonic()
+        
+        if counts_toward_breaker:
+            now = time.monotonic()
+            self._trim_failures(now)
+            self.failure_timestamps.append(now)
         
         if error_type == "rate_limit":
             self.rate_limit_count += 1
         
         self._update_success_rate()
     
+    def _trim_failures(self, now: float):
+        """Drop failures that fell out of the sliding window."""
+        cutoff = now - self.window_seconds
+        timestamps = self.failure_timestamps
+        while timestamps and timestamps[0] < cutoff:
+            timestamps.popleft()
+    
     def _update_success_rate(self):
         """Update success rate percentage."""
         if self.total_requests > 0:
             self.success_rate = (self.successful_requests / self.total_requests) * 100
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for serialization."""
+        return {
+            "total_requests": self.total_requests,
+            "success_rate": self.success_rate,
+            "average_latency": self.average_latency,
+            "average_cost": self.average_cost,
+            "consecutive_failures": self.consecutive_failures,
+            "rate_limit_count": self.rate_limit_count,
+        }
+
+
+@dataclass(slots=True)
+class CircuitBreaker:
+    """Closed/open/half-open state for a single model."""
+    state: CircuitState = CircuitState.CLOSED
+    opened_at: float = 0.0
+    half_open_successes: int = 0
+    probe_in_flight: bool = False
+
+
+# Only upstream health problems trip a breaker; billing, validation and auth
+# errors say nothing about whether the model itself is up.
+_BREAKER_ERROR_TYPES = frozenset({
+    ErrorType.TRANSIENT,
+    ErrorType.RATE_LIMIT,
+    ErrorType.LLM,
+    ErrorType.NETWORK,
+    ErrorType.TIMEOUT,
+})
 
 
 class ModelFallbackChain:
@@ -148,6 +304,16 @@ class ModelFallbackChain:
     def __init__(self):
         """Initialize with default model configurations."""
         self.models: Dict[str, ModelConfig] = {}
+        # Indexes maintained by register_model: non-premium models sorted by
+        # (tier, cost) as candidate extra fallbacks, and capability -> model names
+        self._sorted_models: List[ModelConfig] = []
+        self.by_capability: Dict[str, set] = {}
+        # Flat per-model lookups for the per-request hot path
+        self.timeouts: Dict[str, float] = {}
+        self.costs_per_token: Dict[str, float] = {}
+        # Chains are pure functions of (model, capabilities, budget) until
+        # self.models changes, so identical requests reuse the computed list
+        self._cached_chain = functools.lru_cache(maxsize=512)(self._compute_chain)
         self._initialize_default_models()
     
     def _initialize_default_models(self):
@@ -233,7 +399,29 @@ class ModelFallbackChain:
         ]
         
         for model in models:
-            self.models[model.name] = model
+            self.register_model(model)
+    
+    def register_model(self, model_config: ModelConfig):
+        """Add or replace a model configuration."""
+        previous = self.models.get(model_config.name)
+        if previous is not None:
+            if previous in self._sorted_models:
+                self._sorted_models.remove(previous)
+            for capability in previous.capabilities:
+                self.by_capability[capability].discard(previous.name)
+        
+        self.models[model_config.name] = model_config
+        self.timeouts[model_config.name] = model_config.timeout
+        self.costs_per_token[model_config.name] = model_config.cost_per_token
+        if model_config.tier != ModelTier.PREMIUM:
+            self._sorted_models.append(model_config)
+            self._sorted_models.sort(
+                key=lambda config: (_TIER_RANK[config.tier], config.cost_per_token)
+            )
+        for capability in model_config.capabilities:
+            self.by_capability.setdefault(capability, set()).add(model_config.name)
+        
+        self._cached_chain.cache_clear()
     
     def get_fallback_chain(
         self,
@@ -243,51 +431,57 @@ class ModelFallbackChain:
     ) -> List[str]:
         """Get fallback chain for a model based on requirements."""
         if original_model not in self.models:
-            logger.warning(f"Unknown model {original_model}, using default fallback")
+            logger.warning("Unknown model %s, using default fallback", original_model)
             return list(self.models.keys())[:3]  # Return first 3 models
         
+        # The exact budget is part of the key: rounding it could make a model
+        # priced just above the limit eligible
+        chain = self._cached_chain(
+            original_model,
+            tuple(sorted(set(capabilities_required))),
+            max_cost_per_token,
+        )
+        return list(chain)
+    
+    def _compute_chain(
+        self,
+        original_model: str,
+        capabilities_required: Tuple[str, ...],
+        max_cost_per_token: float
+    ) -> Tuple[str, ...]:
+        """Build the fallback chain; cached by get_fallback_chain."""
         original_config = self.models[original_model]
         fallback_chain = [original_model]
         
+        # A model qualifies if it has any of the required capabilities
+        if capabilities_required:
+            eligible = set().union(
+                *(self.by_capability.get(capability, ()) for capability in capabilities_required)
+            )
+        else:
+            eligible = self.models.keys()
+        
         # Add explicit fallbacks first
         for fallback_model in original_config.fallback_models:
-            if fallback_model in self.models:
-                config = self.models[fallback_model]
-                if (config.cost_per_token <= max_cost_per_token and
-                    self._has_required_capabilities(config, capabilities_required)):
-                    fallback_chain.append(fallback_model)
-        
-        # Add additional models by tier and capability
-        for tier in [ModelTier.STANDARD, ModelTier.EFFICIENT, ModelTier.FALLBACK]:
-            for model_name, config in self.models.items():
-                if (model_name not in fallback_chain and
-                    config.tier == tier and
-                    config.cost_per_token <= max_cost_per_token and
-                    self._has_required_capabilities(config, capabilities_required)):
-                    fallback_chain.append(model_name)
-                    
-                    # Limit fallback chain length
-                    if len(fallback_chain) >= 5:
-                        break
+            config = self.models.get(fallback_model)
+            if (config is not None and
+                fallback_model in eligible and
+                config.cost_per_token <= max_cost_per_token):
+                fallback_chain.append(fallback_model)
+        
+        # Add additional models by tier, cheapest first, in one pass
+        for config in self._sorted_models:
+            if (config.cost_per_token > max_cost_per_token or
+                config.name not in eligible or
+                config.name in fallback_chain):
+                continue
+            fallback_chain.append(config.name)
             
+            # Limit fallback chain length
             if len(fallback_chain) >= 5:
                 break
         
-        return fallback_chain
-    
-    def _has_required_capabilities(
-        self,
-        model_config: ModelConfig,
-        required_capabilities: List[str]
-    ) -> bool:
-        """Check if model has required capabilities."""
-        if not required_capabilities:
-            return True
-        
-        return any(
-            capability in model_config.capabilities
-            for capability in required_capabilities
-        )
+        return tuple(fallback_chain)
     
     def get_model_config(self, model_name: str) -> Optional[ModelConfig]:
         """Get configuration for a model."""
@@ -313,19 +507,35 @@ class SmartLLMRetryManager:
         self.error_handler = ErrorHandler()
         
         # Metrics tracking
-        self.model_metrics: Dict[str, ModelMetrics] = defaultdict(ModelMetrics)
+        # Every known model is registered up front; updates run on the event
+        # loop without awaiting, so they need no lock
+        self.model_metrics: Dict[str, ModelMetrics] = self._initial_metrics()
         self.total_cost: float = 0.0
         self.total_requests: int = 0
+        self._last_success_time: Optional[float] = None
         
-        # Request queue for priority management
-        self.request_queues: Dict[RequestPriority, deque] = {
-            priority: deque() for priority in RequestPriority
-        }
+        # get_metrics snapshot, rebuilt only after something changed
+        self._metrics_snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_dirty = True
+        
+        # Pending requests as a heap of (-priority, enqueued_at, request_id, context)
+        self._pending: List[Tuple[int, float, str, RequestContext]] = []
         
         # Active requests tracking
-        self.active_requests: Dict[str, RequestContext] = {}
+        self.active_requests: "OrderedDict[str, RequestContext]" = OrderedDict()
         self._lock = asyncio.Lock()
         
+        # Backoff delays indexed by attempt number; attempts run up to the
+        # fallback chain length (5), which may exceed max_attempts
+        self._backoff_table = [
+            self.config.base_delay * (self.config.exponential_base ** n)
+            for n in range(max(self.config.max_attempts, 5) + 2)
+        ]
+        self._rng = random.Random()
+        
+        # Per-model circuit breakers
+        self.breakers: Dict[str, CircuitBreaker] = defaultdict(CircuitBreaker)
+        
         logger.info(f"Smart LLM retry manager initialized with config: {self.config}")
     
     async def execute_with_retry(
@@ -360,6 +570,14 @@ class SmartLLMRetryManager:
         """
         capabilities_required = capabilities_required or []
         
+        # Fail fast before any setup when the request can't possibly run
+        ceiling = self.config.global_cost_ceiling
+        breaker = self.breakers.get(original_model)
+        if (ceiling is not None and self.total_cost >= ceiling) or (
+            breaker is not None and self._circuit_rejects(breaker)
+        ):
+            self._fail_fast(request_id, original_model, capabilities_required, max_cost)
+        
         # Create request context
         context = RequestContext(
             request_id=request_id,
@@ -368,27 +586,63 @@ class SmartLLMRetryManager:
             capabilities_required=capabilities_required,
             max_cost=max_cost,
             timeout=timeout or self._get_model_timeout(original_model),
-            created_at=time.time()
+            created_at=time.monotonic()
+        )
+        context.estimated_tokens = self._estimate_tokens(
+            llm_kwargs.get('messages', []), llm_kwargs.get('max_tokens', 1000)
         )
         
+        self._track_request(context)
+        try:
+            return await self._run_fallback_chain(context, llm_call, **llm_kwargs)
+        finally:
+            # Only untrack our own entry; a concurrent request may have
+            # reused the id
+            if self.active_requests.get(request_id) is context:
+                del self.active_requests[request_id]
+    
+    def _track_request(self, context: RequestContext):
+        """Register an in-flight request, evicting expired and excess entries."""
+        active = self.active_requests
+        cutoff = time.monotonic() - _ACTIVE_REQUESTS_TTL
+        while active and (
+            len(active) >= _ACTIVE_REQUESTS_MAX or
+            next(iter(active.values())).created_at < cutoff
+        ):
+            active.popitem(last=False)
+        active[context.request_id] = context
+        # A reused id must move to the end, or the eviction above stops
+        # seeing entries in creation order
+        active.move_to_end(context.request_id)
+    
+    async def _run_fallback_chain(
+        self,
+        context: RequestContext,
+        llm_call: Callable,
+        **llm_kwargs
+    ) -> Any:
+        """Walk the fallback chain for a request until a model succeeds."""
+        request_id = context.request_id
+        
         # Get fallback chain
         fallback_models = self.fallback_chain.get_fallback_chain(
-            original_model,
-            capabilities_required,
-            max_cost / 1000  # Convert to per-token cost
+            context.original_model,
+            context.capabilities_required,
+            context.max_cost / 1000  # Convert to per-token cost
         )
         
         logger.info(
-            f"Starting LLM request {request_id} with fallback chain: {fallback_models}"
+            "Starting LLM request %s with fallback chain: %s", request_id, fallback_models
         )
         
         last_error = None
+        last_idx = len(fallback_models) - 1
         
-        for model_name in fallback_models:
+        for i, model_name in enumerate(fallback_models):
             if context.total_cost >= context.max_cost:
                 logger.warning(
-                    f"Request {request_id} exceeded cost limit: "
-                    f"{context.total_cost:.4f} >= {context.max_cost}"
+                    "Request %s exceeded cost limit: %.4f >= %s",
+                    request_id, context.total_cost, context.max_cost
                 )
                 break
             
@@ -399,38 +653,45 @@ class SmartLLMRetryManager:
                 await self._record_success(
                     model_name,
                     context.total_cost,
-                    time.time() - context.created_at
+                    time.monotonic() - context.created_at
                 )
                 
                 logger.info(
-                    f"Request {request_id} succeeded with model {model_name} "
-                    f"(attempt {context.attempt_count}, cost: ${context.total_cost:.4f})"
+                    "Request %s succeeded with model %s (attempt %d, cost: $%.4f)",
+                    request_id, model_name, context.attempt_count, context.total_cost
                 )
                 
                 return result
                 
+            except CircuitOpenError as e:
+                # Rejected without a network call; move straight to the next model
+                last_error = e
+                context.error_history.append(str(e)[:_MAX_ERROR_LENGTH])
+                logger.debug("Request %s skipped model %s: circuit open", request_id, model_name)
+                continue
+                
             except Exception as e:
                 last_error = e
-                context.error_history.append(str(e))
+                context.error_history.append(str(e)[:_MAX_ERROR_LENGTH])
                 
                 # Classify error and decide if we should continue
                 error_info = self.error_handler.classify_error(e)
-                await self._record_failure(model_name, error_info.error_type.value)
+                await self._record_failure(model_name, error_info.error_type)
                 
                 logger.warning(
-                    f"Request {request_id} failed with model {model_name}: {e} "
-                    f"(type: {error_info.error_type.value})"
+                    "Request %s failed with model %s: %s (type: %s)",
+                    request_id, model_name, e, error_info.error_type.value
                 )
                 
                 # Don't retry on permanent errors unless fallback model available
-                if error_info.error_type == ErrorType.PERMANENT and len(fallback_models) == 1:
+                if error_info.error_type == ErrorType.PERMANENT and last_idx == 0:
                     break
                 
                 # Apply delay before next attempt
-                if model_name != fallback_models[-1]:  # Not the last model
+                if i < last_idx:  # Not the last model
                     delay = self._calculate_delay(context, error_info.error_type)
                     if delay > 0:
-                        logger.debug(f"Waiting {delay:.2f}s before trying next model")
+                        logger.debug("Waiting %.2fs before trying next model", delay)
                         await asyncio.sleep(delay)
         
         # All attempts failed
@@ -446,6 +707,35 @@ class SmartLLMRetryManager:
         else:
             raise Exception(error_msg)
     
+    def enqueue_request(self, context: RequestContext):
+        """Add a request to the priority queue."""
+        heapq.heappush(
+            self._pending,
+            (-context.priority.value, time.monotonic(), context.request_id, context)
+        )
+    
+    def dequeue_request(self) -> Optional[RequestContext]:
+        """
+        Take the next request to run.
+        
+        Usually the highest priority (oldest first within a priority); with
+        probability 1 - priority_bias the oldest request of any priority, so
+        lower priorities keep making progress under sustained load.
+        """
+        if not self._pending:
+            return None
+        
+        if self._rng.random() < self.config.priority_bias:
+            return heapq.heappop(self._pending)[3]
+        
+        oldest = min(range(len(self._pending)), key=lambda i: self._pending[i][1])
+        entry = self._pending[oldest]
+        last = self._pending.pop()
+        if oldest < len(self._pending):
+            self._pending[oldest] = last
+            heapq.heapify(self._pending)
+        return entry[3]
+    
     async def _try_model(
         self,
         context: RequestContext,
@@ -454,6 +744,7 @@ class SmartLLMRetryManager:
         **llm_kwargs
     ) -> Any:
         """Try executing LLM call with specific model."""
+        self._acquire_circuit(model_name)
         context.attempt_count += 1
         context.model_history.append(model_name)
         
@@ -463,9 +754,7 @@ class SmartLLMRetryManager:
             raise Exception(f"Unknown model configuration: {model_name}")
         
         # Calculate estimated cost
-        messages = llm_kwargs.get('messages', [])
-        estimated_tokens = self._estimate_tokens(messages, llm_kwargs.get('max_tokens', 1000))
-        estimated_cost = (estimated_tokens / 1000) * model_config.cost_per_token
+        estimated_cost = (context.estimated_tokens / 1000) * model_config.cost_per_token
         
         if context.total_cost + estimated_cost > context.max_cost:
             raise BillingError(
@@ -480,7 +769,7 @@ class SmartLLMRetryManager:
         })
         
         # Execute the call
-        start_time = time.time()
+        start_time = time.monotonic()
         try:
             result = await llm_call(**llm_kwargs)
             
@@ -491,107 +780,229 @@ class SmartLLMRetryManager:
             
             return result
             
+        except asyncio.CancelledError:
+            # Release a HALF_OPEN probe slot; cancellation says nothing about the model
+            self.breakers[model_name].probe_in_flight = False
+            raise
+            
         except Exception as e:
             # Even failed requests may incur some cost
             context.total_cost += estimated_cost * 0.1  # Minimal cost for failed request
             raise
     
+    def _circuit_rejects(self, breaker: CircuitBreaker) -> bool:
+        """Whether a breaker is OPEN and still cooling down."""
+        return (breaker.state == CircuitState.OPEN and
+                time.monotonic() - breaker.opened_at < self.config.circuit_cooldown)
+    
+    def _fail_fast(
+        self,
+        request_id: str,
+        original_model: str,
+        capabilities_required: List[str],
+        max_cost: float
+    ):
+        """Raise for a request rejected by the pre-checks, unless a fallback can serve it."""
+        ceiling = self.config.global_cost_ceiling
+        if ceiling is not None and self.total_cost >= ceiling:
+            raise BillingError(
+                f"LLM request {request_id} rejected: total spend ${self.total_cost:.4f} "
+                f"reached the ceiling of ${ceiling:.4f}"
+            )
+        
+        # Original model is open; only reject when there is nothing to fall back to
+        chain = self.fallback_chain.get_fallback_chain(
+            original_model, capabilities_required, max_cost / 1000
+        )
+        if len(chain) <= 1:
+            raise CircuitOpenError(f"circuit open for {original_model}")
+    
+    def _acquire_circuit(self, model_name: str):
+        """Reject the call if the model's circuit is open; claim the HALF_OPEN probe."""
+        breaker = self.breakers[model_name]
+        
+        if breaker.state == CircuitState.OPEN:
+            if self._circuit_rejects(breaker):
+                raise CircuitOpenError(f"circuit open for {model_name}")
+            logger.info("Circuit for %s: transitioning to HALF_OPEN", model_name)
+            breaker.state = CircuitState.HALF_OPEN
+            self._snapshot_dirty = True
+            breaker.half_open_successes = 0
+            breaker.probe_in_flight = False
+        
+        if breaker.state == CircuitState.HALF_OPEN:
+            if breaker.probe_in_flight:
+                raise CircuitOpenError(f"circuit half-open for {model_name}, probe in flight")
+            breaker.probe_in_flight = True
+    
+    def _open_circuit(self, model_name: str, breaker: CircuitBreaker, failures: int):
+        """Trip the breaker for a model."""
+        breaker.state = CircuitState.OPEN
+        breaker.opened_at = time.monotonic()
+        breaker.half_open_successes = 0
+        breaker.probe_in_flight = False
+        logger.warning(
+            "Circuit for %s OPEN after %d failures within %ss",
+            model_name, failures, self.config.window_seconds
+        )
+    
+    def _initial_metrics(self) -> Dict[str, ModelMetrics]:
+        """Fresh metrics for every model in the fallback registry."""
+        return {name: self._new_metrics() for name in self.fallback_chain.models}
+    
+    def _metrics_for(self, model_name: str) -> ModelMetrics:
+        """Metrics for a model, registering models added after startup."""
+        metrics = self.model_metrics.get(model_name)
+        if metrics is None:
+            metrics = self.model_metrics[model_name] = self._new_metrics()
+        return metrics
+    
+    def _new_metrics(self) -> ModelMetrics:
+        """Create metrics whose failure window matches the breaker config."""
+        return ModelMetrics(
+            window_seconds=self.config.window_seconds,
+            failure_timestamps=deque(maxlen=self.config.circuit_failure_threshold),
+        )
+    
     def _calculate_delay(self, context: RequestContext, error_type: ErrorType) -> float:
         """Calculate delay before next retry attempt."""
         if error_type == ErrorType.RATE_LIMIT:
-            return self.config.rate_limit_delay + random.uniform(0, 5)
+            return self.config.rate_limit_delay + self._rng.uniform(0, 5)
         
         elif error_type == ErrorType.TIMEOUT:
-            return self.config.base_delay * (self.config.exponential_base ** context.attempt_count)
+            return self._backoff(context.attempt_count)
         
         elif error_type == ErrorType.NETWORK:
-            base_delay = self.config.base_delay * (self.config.exponential_base ** context.attempt_count)
-            jitter = base_delay * self.config.jitter_factor * random.uniform(-1, 1)
-            return min(base_delay + jitter, self.config.max_delay)
+            # Decorrelated jitter: never below base_delay, spreads retry storms
+            base_delay = self.config.base_delay
+            prev_delay = context.prev_delay or base_delay
+            delay = min(self.config.max_delay, self._rng.uniform(base_delay, prev_delay * 3))
+            context.prev_delay = delay
+            return delay
         
         else:
             # For other errors, minimal delay
             return self.config.base_delay
     
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff for an attempt number, from the precomputed table."""
+        if attempt < len(self._backoff_table):
+            return self._backoff_table[attempt]
+        return self.config.base_delay * (self.config.exponential_base ** attempt)
+    
     def _estimate_tokens(self, messages: List[Dict], max_tokens: int) -> int:
         """Estimate token count for messages."""
         # Simple estimation: ~4 characters per token
-        total_chars = 0
-        for message in messages:
-            content = message.get('content', '')
-            if isinstance(content, str):
-                total_chars += len(content)
-            elif isinstance(content, list):
-                for item in content:
-                    if isinstance(item, dict) and 'text' in item:
-                        total_chars += len(item['text'])
+        total_chars = sum(self._message_chars(message) for message in messages)
         
         input_tokens = total_chars // 4
         return input_tokens + max_tokens  # Input + estimated output
     
+    @staticmethod
+    def _message_chars(message: Dict) -> int:
+        """Count the text characters in a message."""
+        content = message.get('content', '')
+        if isinstance(content, str):
+            return len(content)
+        if isinstance(content, list):
+            return sum(
+                len(item['text']) for item in content
+                if isinstance(item, dict) and 'text' in item
+            )
+        return 0
+    
     def _calculate_actual_cost(self, result: Any, model_config: ModelConfig) -> float:
         """Calculate actual cost from LLM response."""
-        try:
-            if hasattr(result, 'usage') and result.usage:
-                total_tokens = result.usage.prompt_tokens + result.usage.completion_tokens
-                return (total_tokens / 1000) * model_config.cost_per_token
-        except Exception as e:
-            logger.debug(f"Could not calculate actual cost: {e}")
-        
-        # Fallback to estimation
-        return 0.001  # Minimal cost if we can't calculate
+        return _cost_extractor(result)(result, model_config.cost_per_token)
     
     def _get_model_timeout(self, model_name: str) -> float:
         """Get timeout for specific model."""
-        model_config = self.fallback_chain.get_model_config(model_name)
-        return model_config.timeout if model_config else 30.0
+        return self.fallback_chain.timeouts.get(model_name, 30.0)
     
     async def _record_success(self, model_name: str, cost: float, latency: float):
         """Record successful request metrics."""
-        async with self._lock:
-            self.model_metrics[model_name].update_success(latency, cost)
-            self.total_requests += 1
+        self._metrics_for(model_name).update_success(latency, cost)
+        self.total_requests += 1
+        self._last_success_time = time.monotonic()
+        self._snapshot_dirty = True
+        
+        breaker = self.breakers[model_name]
+        if breaker.state == CircuitState.HALF_OPEN:
+            breaker.probe_in_flight = False
+            breaker.half_open_successes += 1
+            if breaker.half_open_successes >= self.config.circuit_success_threshold:
+                breaker.state = CircuitState.CLOSED
+                logger.info("Circuit for %s CLOSED", model_name)
     
-    async def _record_failure(self, model_name: str, error_type: str):
+    async def _record_failure(self, model_name: str, error_type: ErrorType):
         """Record failed request metrics."""
-        async with self._lock:
-            self.model_metrics[model_name].update_failure(error_type)
-            self.total_requests += 1
+        counts = error_type in _BREAKER_ERROR_TYPES
+        metrics = self._metrics_for(model_name)
+        metrics.update_failure(error_type.value, counts_toward_breaker=counts)
+        self.total_requests += 1
+        self._snapshot_dirty = True
+        
+        breaker = self.breakers[model_name]
+        breaker.probe_in_flight = False
+        if not counts:
+            return
+        
+        failures = metrics.consecutive_failures
+        if (breaker.state == CircuitState.HALF_OPEN or
+                failures >= self.config.circuit_failure_threshold):
+            self._open_circuit(model_name, breaker, failures)
     
     async def get_metrics(self) -> Dict[str, Any]:
-        """Get current performance metrics."""
-        async with self._lock:
-            return {
-                "total_requests": self.total_requests,
-                "total_cost": self.total_cost,
-                "average_cost_per_request": (
-                    self.total_cost / self.total_requests
-                    if self.total_requests > 0 else 0
-                ),
-                "models": {
-                    model_name: {
-                        "total_requests": metrics.total_requests,
-                        "success_rate": metrics.success_rate,
-                        "average_latency": metrics.average_latency,
-                        "average_cost": metrics.average_cost,
-                        "consecutive_failures": metrics.consecutive_failures,
-                        "rate_limit_count": metrics.rate_limit_count,
-                    }
-                    for model_name, metrics in self.model_metrics.items()
-                },
-                "config": {
-                    "max_attempts": self.config.max_attempts,
-                    "cost_limit_per_request": self.config.cost_limit_per_request,
-                    "rate_limit_delay": self.config.rate_limit_delay,
-                }
+        """
+        Get current performance metrics.
+        
+        The snapshot is rebuilt only after a request was recorded, so frequent
+        scrapes between requests reuse it. Treat the result as read-only.
+        """
+        if self._snapshot_dirty or self._metrics_snapshot is None:
+            self._metrics_snapshot = self._build_metrics_snapshot()
+            self._snapshot_dirty = False
+        
+        last_success = self._last_success_time
+        return {
+            **self._metrics_snapshot,
+            "last_success_age_s": (
+                time.monotonic() - last_success if last_success is not None else None
+            ),
+        }
+    
+    def _build_metrics_snapshot(self) -> Dict[str, Any]:
+        """Build the request-independent part of get_metrics."""
+        models = {}
+        for model_name, metrics in self.model_metrics.items():
+            model_snapshot = metrics.to_dict()
+            model_snapshot["circuit_state"] = self.breakers[model_name].state.value
+            models[model_name] = model_snapshot
+        
+        return {
+            "total_requests": self.total_requests,
+            "total_cost": self.total_cost,
+            "average_cost_per_request": (
+                self.total_cost / self.total_requests
+                if self.total_requests > 0 else 0
+            ),
+            "models": models,
+            "config": {
+                "max_attempts": self.config.max_attempts,
+                "cost_limit_per_request": self.config.cost_limit_per_request,
+                "rate_limit_delay": self.config.rate_limit_delay,
             }
+        }
     
     async def reset_metrics(self):
         """Reset all metrics."""
         async with self._lock:
-            self.model_metrics.clear()
+            self.model_metrics = self._initial_metrics()
+            self.breakers.clear()
             self.total_cost = 0.0
             self.total_requests = 0
+            self._last_success_time = None
+            self._snapshot_dirty = True
             logger.info("LLM retry manager metrics reset")
 
 
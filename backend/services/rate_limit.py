@@ -0,0 +1,212 @@
+"""
+Distributed concurrent-request limiter backed by a Redis sorted set.
+
+Each client owns a sorted set of in-flight request IDs scored by their start
+time. A Lua script atomically drops entries older than the window, checks the
+remaining count and registers the new request, so the limit holds across all
+API workers rather than per process.
+
+Long-lived requests (SSE streams, agent runs) would otherwise age out of the
+window while still running; ``keep_alive`` re-scores their entry every half
+window until the request finishes.
+
+The limiter must never make a request slower: Redis calls have a short
+timeout, nothing waits for a connection to be established, and after a
+failure (or while the Redis circuit breaker is open) requests are let
+through without touching Redis.
+"""
+
+import asyncio
+import secrets
+import time
+from typing import Optional
+
+from services import redis
+from services.redis_circuit_breaker import get_circuit_breaker
+from utils.config import config
+from utils.logger import logger
+
+MAX_CONCURRENT_REQUESTS_PER_IP = 25
+# Entries older than this are assumed leaked (e.g. a worker died mid-request)
+CONCURRENCY_WINDOW_SECONDS = 60
+# Liveness/readiness probes never count against (or wait on) the limiter
+EXEMPT_PATH_PREFIXES = ("/api/health",)
+
+_KEY_PREFIX = "concurrent_requests:"
+_REDIS_TIMEOUT = 0.25      # Budget for each limiter round-trip
+_FAILURE_BACKOFF = 5.0     # Skip the limiter this long after a Redis failure
+
+_ACQUIRE_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local request_id = ARGV[4]
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+if redis.call('ZCARD', key) >= limit then
+    return 0
+end
+redis.call('ZADD', key, now, request_id)
+redis.call('EXPIRE', key, window)
+return 1
+"""
+
+_acquire_script = None
+_skip_until = 0.0
+_connect_task: Optional[asyncio.Task] = None
+
+
+def is_exempt(path: str) -> bool:
+    """Whether requests to ``path`` bypass the limiter."""
+    return path.startswith(EXEMPT_PATH_PREFIXES)
+
+
+def client_key(scope) -> str:
+    """
+    Identify the client of an ASGI request.
+
+    By default this is the socket peer. Behind proxies (config
+    TRUSTED_PROXY_COUNT > 0) the peer is the proxy itself, so the address
+    comes from X-Forwarded-For: the entry appended by the outermost trusted
+    proxy. Entries to its left are client supplied and not trusted.
+    """
+    proxy_count = config.TRUSTED_PROXY_COUNT
+    if proxy_count > 0:
+        forwarded = [
+            value.decode("latin-1")
+            for name, value in scope.get("headers", ())
+            if name == b"x-forwarded-for"
+        ]
+        if forwarded:
+            hops = [hop.strip() for hop in ",".join(forwarded).split(",") if hop.strip()]
+            if hops:
+                return hops[-min(proxy_count, len(hops))]
+
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _back_off(error: BaseException):
+    """Let requests bypass the limiter for a while after a Redis failure."""
+    global _skip_until
+    _skip_until = time.monotonic() + _FAILURE_BACKOFF
+    logger.warning(f"Concurrency limiter unavailable, allowing requests for {_FAILURE_BACKOFF}s: {error!r}")
+
+
+async def _connect():
+    """Establish the Redis connection off the request path."""
+    try:
+        await redis.get_client()
+    except Exception as e:
+        _back_off(e)
+
+
+def _redis_client():
+    """The connected Redis client, or None if the limiter should fail open."""
+    global _connect_task
+    if time.monotonic() < _skip_until or get_circuit_breaker().is_open():
+        return None
+
+    redis_client = redis.get_client_if_ready()
+    if redis_client is None and (_connect_task is None or _connect_task.done()):
+        # Connecting can take seconds when Redis is down; don't make this
+        # request wait for it
+        _connect_task = asyncio.create_task(_connect())
+    return redis_client
+
+
+async def acquire(
+    client: str,
+    limit: int = MAX_CONCURRENT_REQUESTS_PER_IP,
+    window: int = CONCURRENCY_WINDOW_SECONDS,
+) -> Optional[str]:
+    """
+    Register an in-flight request for ``client``.
+
+    Returns a slot token to pass to ``release`` when the request finishes, an
+    empty string if the client is over its limit, or ``None`` if Redis is
+    unavailable (callers should fail open).
+    """
+    global _acquire_script
+    redis_client = _redis_client()
+    if redis_client is None:
+        return None
+
+    try:
+        if _acquire_script is None:
+            _acquire_script = redis_client.register_script(_ACQUIRE_SCRIPT)
+        request_id = secrets.token_hex(4)
+        async with asyncio.timeout(_REDIS_TIMEOUT):
+            allowed = await _acquire_script(
+                keys=[_KEY_PREFIX + client],
+                args=[limit, window, time.time(), request_id],
+                client=redis_client,
+            )
+        return request_id if allowed else ""
+    except Exception as e:
+        _back_off(e)
+        return None
+
+
+async def refresh(client: str, request_id: str, window: int = CONCURRENCY_WINDOW_SECONDS) -> None:
+    """Re-score a still-running request so the window doesn't drop it."""
+    redis_client = _redis_client()
+    if redis_client is None:
+        return
+    key = _KEY_PREFIX + client
+    try:
+        async with asyncio.timeout(_REDIS_TIMEOUT):
+            # XX: never re-add a slot that was already released
+            await redis_client.zadd(key, {request_id: time.time()}, xx=True)
+            await redis_client.expire(key, window)
+    except Exception as e:
+        _back_off(e)
+
+
+class _SlotKeepAlive:
+    """Refreshes a slot every half window until cancelled."""
+
+    __slots__ = ("client", "request_id", "_handle", "_task")
+
+    def __init__(self, client: str, request_id: str):
+        self.client = client
+        self.request_id = request_id
+        self._task: Optional[asyncio.Task] = None
+        # A timer rather than a sleeping task: most requests finish long
+        # before the first refresh is due
+        self._handle = asyncio.get_running_loop().call_later(
+            CONCURRENCY_WINDOW_SECONDS / 2, self._fire
+        )
+
+    def _fire(self):
+        self._task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self):
+        await refresh(self.client, self.request_id)
+        self._handle = asyncio.get_running_loop().call_later(
+            CONCURRENCY_WINDOW_SECONDS / 2, self._fire
+        )
+
+    def cancel(self):
+        self._handle.cancel()
+        if self._task is not None:
+            self._task.cancel()
+
+
+def keep_alive(client: str, request_id: str) -> _SlotKeepAlive:
+    """Keep an acquired slot counted for as long as its request runs; cancel when done."""
+    return _SlotKeepAlive(client, request_id)
+
+
+async def release(client: str, request_id: str) -> None:
+    """Remove a previously acquired slot."""
+    redis_client = _redis_client()
+    if redis_client is None:
+        # The entry ages out of the window on its own
+        return
+    try:
+        async with asyncio.timeout(_REDIS_TIMEOUT):
+            await redis_client.zrem(_KEY_PREFIX + client, request_id)
+    except Exception as e:
+        logger.warning(f"Failed to release concurrency slot for {client}: {e}")
@@ -102,6 +102,13 @@ async def initialize_async():
     return client
 
 
+async def warm_pool(connections: int = 8):
+    """Pre-open pooled connections so early requests skip the TCP/AUTH handshake."""
+    redis_client = await get_client()
+    await asyncio.gather(*(redis_client.ping() for _ in range(connections)))
+    logger.debug(f"Warmed Redis connection pool with {connections} connections")
+
+
 async def close():
     """Close Redis connection and connection pool."""
     global client, pool, _initialized
@@ -139,6 +146,11 @@ async def get_client():
     return client
 
 
+def get_client_if_ready():
+    """Return the Redis client if it's already connected, without initializing or waiting."""
+    return client if _initialized else None
+
+
 # Basic Redis operations
 async def set(key: str, value: str, ex: int = None, nx: bool = False):
     """Set a Redis key with circuit breaker protection."""
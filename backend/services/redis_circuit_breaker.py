@@ -309,6 +309,13 @@ class RedisCircuitBreaker:
             # Re-raise if no fallback
             raise
     
+    def is_open(self) -> bool:
+        """Whether requests are currently rejected: OPEN and not yet due for a recovery attempt."""
+        return (
+            self.state == CircuitState.OPEN
+            and time.time() - self.state_change_time < self.config.recovery_timeout
+        )
+    
     async def _should_reject_request(self, operation_type: OperationType) -> bool:
         """Check if request should be rejected based on circuit state."""
         async with self._lock:
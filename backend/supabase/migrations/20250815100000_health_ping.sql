@@ -0,0 +1,15 @@
+BEGIN;
+
+-- Trivial function used by the /health-docker probe to verify database
+-- connectivity without touching any table.
+CREATE OR REPLACE FUNCTION ping()
+RETURNS INTEGER
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT 1;
+$$;
+
+GRANT EXECUTE ON FUNCTION ping TO authenticated, service_role;
+
+COMMIT;
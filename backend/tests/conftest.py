@@ -0,0 +1,18 @@
+import os
+
+# utils.config validates these at import time; the tests never reach the
+# services behind them
+for _name, _value in {
+    "ENV_MODE": "local",
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_ANON_KEY": "test",
+    "SUPABASE_SERVICE_ROLE_KEY": "test",
+    "REDIS_HOST": "localhost",
+    "DAYTONA_API_KEY": "test",
+    "DAYTONA_SERVER_URL": "http://localhost:3000/api",
+    "DAYTONA_TARGET": "us",
+    "TAVILY_API_KEY": "test",
+    "RAPID_API_KEY": "test",
+    "FIRECRAWL_API_KEY": "test",
+}.items():
+    os.environ.setdefault(_name, _value)
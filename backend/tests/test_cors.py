@@ -0,0 +1,124 @@
+import re
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from utils.cors import CachedCORSMiddleware, FastPreflightMiddleware
+
+ORIGIN = "https://app.example.com"
+CORS_SETTINGS = dict(
+    allow_origins=frozenset([ORIGIN]),
+    allow_credentials=True,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+)
+
+
+def _build_app():
+    calls = []
+
+    async def endpoint(request):
+        calls.append(request.method)
+        return PlainTextResponse("ok", headers={"Vary": "Accept-Encoding"})
+
+    app = Starlette(routes=[Route("/items", endpoint, methods=["GET", "POST"])])
+    app.add_middleware(
+        CachedCORSMiddleware,
+        allow_origin_regex=re.compile(r"https://preview-\d+\.example\.com"),
+        **CORS_SETTINGS,
+    )
+    app.add_middleware(FastPreflightMiddleware, **CORS_SETTINGS)
+    return app, calls
+
+
+@pytest.fixture
+def client():
+    app, calls = _build_app()
+    transport = httpx.ASGITransport(app=app)
+    http = httpx.AsyncClient(transport=transport, base_url="http://test")
+    http.calls = calls
+    return http
+
+
+def _preflight(origin=ORIGIN, method="POST", headers="content-type, authorization"):
+    request_headers = {"Origin": origin, "Access-Control-Request-Method": method}
+    if headers is not None:
+        request_headers["Access-Control-Request-Headers"] = headers
+    return request_headers
+
+
+async def test_fast_preflight_for_allowed_request(client):
+    response = await client.options("/items", headers=_preflight())
+
+    assert response.status_code == 204
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+    assert response.headers["access-control-allow-credentials"] == "true"
+    assert response.headers["access-control-allow-methods"] == "GET, POST"
+    assert "authorization" in response.headers["access-control-allow-headers"].lower()
+    assert response.headers["vary"] == "Origin"
+
+
+async def test_preflight_without_requested_headers(client):
+    response = await client.options("/items", headers=_preflight(headers=None))
+
+    assert response.status_code == 204
+
+
+@pytest.mark.parametrize("overrides", [
+    {"origin": "https://evil.example.com"},
+    {"method": "DELETE"},
+    {"headers": "x-not-allowed"},
+])
+async def test_invalid_preflight_falls_through_to_cors_middleware(client, overrides):
+    response = await client.options("/items", headers=_preflight(**overrides))
+
+    # Starlette's CORSMiddleware rejects these with a detailed 400
+    assert response.status_code == 400
+
+
+async def test_regex_origin_preflight_handled_by_cors_middleware(client):
+    origin = "https://preview-42.example.com"
+    response = await client.options("/items", headers=_preflight(origin=origin))
+
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == origin
+
+
+async def test_simple_request_gets_cors_headers(client):
+    response = await client.get("/items", headers={"Origin": ORIGIN})
+
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+    assert response.headers["access-control-allow-credentials"] == "true"
+    # The endpoint's own Vary is kept and extended, not replaced
+    assert response.headers["vary"] == "Accept-Encoding, Origin"
+    assert client.calls == ["GET"]
+
+
+async def test_disallowed_origin_gets_no_allow_origin(client):
+    response = await client.get("/items", headers={"Origin": "https://evil.example.com"})
+
+    assert response.status_code == 200
+    assert "access-control-allow-origin" not in response.headers
+
+
+async def test_request_without_origin_is_untouched(client):
+    response = await client.get("/items")
+
+    assert response.status_code == 200
+    assert "access-control-allow-origin" not in response.headers
+
+
+def test_cached_middleware_matches_exact_and_regex_origins():
+    middleware = CachedCORSMiddleware(
+        None,
+        allow_origin_regex=r"https://preview-\d+\.example\.com",
+        **CORS_SETTINGS,
+    )
+
+    assert middleware.is_allowed_origin(ORIGIN)
+    assert middleware.is_allowed_origin("https://preview-7.example.com")
+    assert not middleware.is_allowed_origin("https://preview-x.example.com")
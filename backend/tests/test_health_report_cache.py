@@ -0,0 +1,103 @@
+import pytest
+
+from sandbox import health_check
+from sandbox.health_check import SandboxHealthReport, SandboxHealthStatus, _ReportCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health_check.time, "monotonic", clock)
+    return clock
+
+
+def _report(sandbox_id):
+    return SandboxHealthReport(sandbox_id=sandbox_id, status=SandboxHealthStatus.HEALTHY)
+
+
+def test_get_returns_fresh_entry(clock):
+    cache = _ReportCache(maxsize=4, ttl=30)
+    report = _report("a")
+    cache.set("a", report)
+
+    clock.now += 29
+    assert cache.get("a") is report
+    assert cache.get("missing") is None
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = _ReportCache(maxsize=4, ttl=30)
+    cache.set("a", _report("a"))
+
+    clock.now += 30
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = _ReportCache(maxsize=2, ttl=30)
+    cache.set("a", _report("a"))
+    cache.set("b", _report("b"))
+    # Reading "a" makes "b" the least recently used
+    cache.get("a")
+
+    cache.set("c", _report("c"))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_stale_entry_served_until_hard_deadline(clock):
+    cache = _ReportCache(maxsize=4, ttl=30)
+    report = _report("a")
+    cache.set("a", report, fingerprint=("started", "t1"))
+
+    clock.now += 45
+    assert cache.get("a") is None
+    assert cache.get_stale("a") == (report, ("started", "t1"))
+
+    clock.now += 15
+    assert cache.get_stale("a") is None
+    # Past the hard deadline the entry is gone entirely
+    assert cache.pop("a") is None
+
+
+def test_revalidate_extends_ttl_up_to_hard_deadline(clock):
+    cache = _ReportCache(maxsize=4, ttl=30)
+    report = _report("a")
+    cache.set("a", report)
+
+    clock.now += 40
+    cache.revalidate("a")
+    assert cache.get("a") is report
+
+    # Revalidation never pushes the entry past twice the original TTL
+    clock.now += 20
+    assert cache.get("a") is None
+    assert cache.get_stale("a") is None
+
+
+def test_revalidate_missing_entry_is_noop(clock):
+    cache = _ReportCache(maxsize=4, ttl=30)
+
+    cache.revalidate("missing")
+
+    assert cache.get("missing") is None
+
+
+def test_pop_removes_entry(clock):
+    cache = _ReportCache(maxsize=4, ttl=30)
+    report = _report("a")
+    cache.set("a", report)
+
+    assert cache.pop("a") is report
+    assert cache.get("a") is None
+    assert cache.get_stale("a") is None
@@ -0,0 +1,252 @@
+import asyncio
+import time
+
+import pytest
+
+from services.llm_retry_manager import (
+    CircuitOpenError,
+    CircuitState,
+    ModelConfig,
+    ModelFallbackChain,
+    ModelTier,
+    RequestContext,
+    RequestPriority,
+    RetryConfig,
+    SmartLLMRetryManager,
+)
+from utils.error_handler import TransientError
+
+SONNET_37 = "anthropic/claude-3-7-sonnet-latest"
+SONNET_35 = "anthropic/claude-3-5-sonnet-20241022"
+HAIKU = "anthropic/claude-3-haiku-20240307"
+GPT_4O = "openai/gpt-4o"
+GPT_4O_MINI = "openai/gpt-4o-mini"
+GPT_35 = "openai/gpt-3.5-turbo"
+
+
+class TestFallbackChain:
+    def test_explicit_fallbacks_then_extras_by_tier_and_cost(self):
+        chain = ModelFallbackChain()
+
+        assert chain.get_fallback_chain(SONNET_37, [], 1.0) == [
+            SONNET_37, SONNET_35, GPT_4O, GPT_4O_MINI, HAIKU,
+        ]
+
+    def test_filters_by_capability(self):
+        chain = ModelFallbackChain()
+
+        assert chain.get_fallback_chain(SONNET_37, ["thinking"], 1.0) == [SONNET_37]
+
+    def test_filters_by_cost(self):
+        chain = ModelFallbackChain()
+
+        # The original model is always tried; fallbacks must fit the budget
+        assert chain.get_fallback_chain(SONNET_37, [], 0.001) == [
+            SONNET_37, GPT_4O_MINI, HAIKU, GPT_35,
+        ]
+
+    def test_budget_just_below_price_excludes_model(self):
+        chain = ModelFallbackChain()
+
+        # gpt-4o costs 0.0025; rounding this budget to 6 decimals would admit it
+        assert GPT_4O not in chain.get_fallback_chain(SONNET_35, [], 0.0024999)
+        assert GPT_4O in chain.get_fallback_chain(SONNET_35, [], 0.0025)
+
+    def test_unknown_model_uses_default_chain(self):
+        chain = ModelFallbackChain()
+
+        assert chain.get_fallback_chain("unknown/model", [], 1.0) == list(chain.models)[:3]
+
+    def test_register_model_invalidates_cached_chains(self):
+        chain = ModelFallbackChain()
+        assert chain.get_fallback_chain(SONNET_37, ["thinking"], 1.0) == [SONNET_37]
+
+        chain.register_model(ModelConfig(
+            name="test/thinker",
+            tier=ModelTier.EFFICIENT,
+            cost_per_token=0.0001,
+            max_tokens=4096,
+            timeout=10.0,
+            rate_limit_rpm=100,
+            capabilities=["thinking"],
+        ))
+
+        assert chain.get_fallback_chain(SONNET_37, ["thinking"], 1.0) == [SONNET_37, "test/thinker"]
+        assert chain.timeouts["test/thinker"] == 10.0
+
+    def test_returned_chain_is_a_copy(self):
+        chain = ModelFallbackChain()
+
+        chain.get_fallback_chain(GPT_4O, [], 1.0).append("mutated")
+
+        assert "mutated" not in chain.get_fallback_chain(GPT_4O, [], 1.0)
+
+
+class FakeLLM:
+    """Records calls and fails for the models listed in ``failures``."""
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.calls = []
+
+    async def __call__(self, model, **kwargs):
+        self.calls.append(model)
+        error = self.failures.get(model)
+        if error is not None:
+            raise error
+        return {"model": model}
+
+
+@pytest.fixture
+def manager():
+    return SmartLLMRetryManager(RetryConfig(
+        base_delay=0.0,
+        circuit_failure_threshold=2,
+        circuit_success_threshold=1,
+    ))
+
+
+async def _run(manager, llm, request_id="req", model=GPT_4O, **kwargs):
+    kwargs.setdefault("max_cost", 100.0)
+    return await manager.execute_with_retry(
+        request_id, llm, model, messages=[{"role": "user", "content": "hi"}], **kwargs
+    )
+
+
+def _expire_cooldown(manager, model):
+    manager.breakers[model].opened_at -= manager.config.circuit_cooldown
+
+
+async def test_falls_back_to_next_model(manager):
+    llm = FakeLLM({GPT_4O: TransientError("overloaded")})
+
+    assert await _run(manager, llm) == {"model": GPT_4O_MINI}
+    assert llm.calls == [GPT_4O, GPT_4O_MINI]
+
+
+async def test_repeated_failures_open_circuit(manager):
+    llm = FakeLLM({GPT_4O: TransientError("overloaded")})
+    for i in range(2):
+        await _run(manager, llm, request_id=f"req-{i}")
+    assert manager.breakers[GPT_4O].state == CircuitState.OPEN
+
+    llm.calls.clear()
+    assert await _run(manager, llm, request_id="req-open") == {"model": GPT_4O_MINI}
+    # The open model is skipped without a call
+    assert llm.calls == [GPT_4O_MINI]
+
+
+async def test_non_health_errors_do_not_open_circuit(manager):
+    llm = FakeLLM({GPT_4O: ValueError("invalid request")})
+    for i in range(3):
+        await _run(manager, llm, request_id=f"req-{i}")
+
+    assert manager.breakers[GPT_4O].state == CircuitState.CLOSED
+
+
+async def test_open_circuit_without_fallback_fails_fast(manager):
+    llm = FakeLLM({SONNET_37: TransientError("overloaded")})
+    for i in range(2):
+        with pytest.raises(TransientError):
+            await _run(manager, llm, request_id=f"req-{i}", model=SONNET_37,
+                       capabilities_required=["thinking"])
+
+    llm.calls.clear()
+    with pytest.raises(CircuitOpenError):
+        await _run(manager, llm, request_id="req-open", model=SONNET_37,
+                   capabilities_required=["thinking"])
+    assert llm.calls == []
+
+
+async def test_half_open_probe_success_closes_circuit(manager):
+    llm = FakeLLM({GPT_4O: TransientError("overloaded")})
+    for i in range(2):
+        await _run(manager, llm, request_id=f"req-{i}")
+    _expire_cooldown(manager, GPT_4O)
+
+    llm.failures.clear()
+    assert await _run(manager, llm, request_id="probe") == {"model": GPT_4O}
+    assert manager.breakers[GPT_4O].state == CircuitState.CLOSED
+
+
+async def test_half_open_probe_failure_reopens_circuit(manager):
+    llm = FakeLLM({GPT_4O: TransientError("overloaded")})
+    for i in range(2):
+        await _run(manager, llm, request_id=f"req-{i}")
+    _expire_cooldown(manager, GPT_4O)
+
+    await _run(manager, llm, request_id="probe")
+
+    breaker = manager.breakers[GPT_4O]
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.probe_in_flight
+
+
+async def test_half_open_allows_single_probe(manager):
+    breaker = manager.breakers[GPT_4O]
+    manager._open_circuit(GPT_4O, breaker, failures=2)
+    _expire_cooldown(manager, GPT_4O)
+
+    manager._acquire_circuit(GPT_4O)
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    with pytest.raises(CircuitOpenError):
+        manager._acquire_circuit(GPT_4O)
+
+
+async def test_metrics_snapshots_are_not_mutated_later(manager):
+    llm = FakeLLM()
+    await _run(manager, llm, request_id="first")
+    first = await manager.get_metrics()
+
+    await _run(manager, llm, request_id="second")
+    second = await manager.get_metrics()
+
+    assert first["models"][GPT_4O]["total_requests"] == 1
+    assert second["models"][GPT_4O]["total_requests"] == 2
+
+
+async def test_reused_request_id_is_tracked_as_newest(manager):
+    for request_id in ("a", "b"):
+        manager._track_request(_context(manager, request_id))
+    reused = _context(manager, "a")
+
+    manager._track_request(reused)
+
+    assert list(manager.active_requests) == ["b", "a"]
+    assert manager.active_requests["a"] is reused
+
+
+async def test_finishing_request_keeps_concurrent_request_with_same_id(manager):
+    releases = {}
+
+    async def blocking_llm(model, **kwargs):
+        await releases[kwargs["tag"]].wait()
+        return {"model": model}
+
+    tasks = {}
+    for tag in ("first", "second"):
+        releases[tag] = asyncio.Event()
+        tasks[tag] = asyncio.create_task(_run(manager, blocking_llm, request_id="dup", tag=tag))
+        await asyncio.sleep(0)
+    second_context = manager.active_requests["dup"]
+
+    releases["first"].set()
+    await tasks["first"]
+    assert manager.active_requests.get("dup") is second_context
+
+    releases["second"].set()
+    await tasks["second"]
+    assert "dup" not in manager.active_requests
+
+
+def _context(manager, request_id):
+    return RequestContext(
+        request_id=request_id,
+        priority=RequestPriority.NORMAL,
+        original_model=GPT_4O,
+        capabilities_required=[],
+        max_cost=10.0,
+        timeout=30.0,
+        created_at=time.monotonic(),
+    )
@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from sandbox.tool_base import _ProjectSandboxLoader
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.project_ids = None
+
+    def select(self, columns):
+        self.columns = columns
+        return self
+
+    def in_(self, column, values):
+        assert column == "project_id"
+        self.project_ids = list(values)
+        return self
+
+    async def execute(self):
+        self.client.queries.append(self.project_ids)
+        await asyncio.sleep(0)
+        if self.client.error is not None:
+            raise self.client.error
+        rows = [self.client.rows[pid] for pid in self.project_ids if pid in self.client.rows]
+        return SimpleNamespace(data=rows)
+
+
+class FakeClient:
+    """Just enough of the Supabase query builder for the loader."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.error = None
+
+    def table(self, name):
+        assert name == "projects"
+        return FakeQuery(self, name)
+
+
+def _row(project_id, sandbox_id):
+    return {"project_id": project_id, "sandbox": {"id": sandbox_id}}
+
+
+@pytest.fixture
+def client():
+    return FakeClient({"p1": _row("p1", "s1"), "p2": _row("p2", "s2")})
+
+
+async def test_concurrent_lookups_share_one_query(client):
+    loader = _ProjectSandboxLoader()
+
+    results = await asyncio.gather(
+        loader.load(client, "p1"),
+        loader.load(client, "p2"),
+        loader.load(client, "p1"),
+    )
+
+    assert len(client.queries) == 1
+    assert sorted(client.queries[0]) == ["p1", "p2"]
+    assert results == [_row("p1", "s1"), _row("p2", "s2"), _row("p1", "s1")]
+
+
+async def test_missing_project_resolves_to_none(client):
+    loader = _ProjectSandboxLoader()
+
+    assert await loader.load(client, "unknown") is None
+
+
+async def test_sequential_lookups_query_separately(client):
+    loader = _ProjectSandboxLoader()
+
+    assert await loader.load(client, "p1") == _row("p1", "s1")
+    assert await loader.load(client, "p2") == _row("p2", "s2")
+
+    assert client.queries == [["p1"], ["p2"]]
+
+
+async def test_lookup_during_query_starts_new_batch(client):
+    loader = _ProjectSandboxLoader()
+
+    first = asyncio.create_task(loader.load(client, "p1"))
+    # Let the first batch dispatch its query
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    second = asyncio.create_task(loader.load(client, "p2"))
+
+    assert await first == _row("p1", "s1")
+    assert await second == _row("p2", "s2")
+    assert client.queries == [["p1"], ["p2"]]
+
+
+async def test_query_error_fails_every_waiter(client):
+    client.error = ConnectionError("database down")
+    loader = _ProjectSandboxLoader()
+
+    results = await asyncio.gather(
+        loader.load(client, "p1"),
+        loader.load(client, "p2"),
+        return_exceptions=True,
+    )
+
+    assert len(client.queries) == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+    # The loader recovers for the next batch
+    client.error = None
+    assert await loader.load(client, "p1") == _row("p1", "s1")
@@ -0,0 +1,216 @@
+import asyncio
+
+import pytest
+
+from services import rate_limit
+
+
+class FakeRedis:
+    """In-memory stand-in for the sorted-set commands the limiter uses."""
+
+    def __init__(self):
+        self.sets = {}
+        self.fail_with = None
+        self.delay = 0.0
+
+    async def _call(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_with is not None:
+            raise self.fail_with
+
+    def register_script(self, script):
+        async def run(keys, args, client):
+            await client._call()
+            limit, window, now, request_id = args
+            entries = client.sets.setdefault(keys[0], {})
+            for member, score in list(entries.items()):
+                if score <= now - window:
+                    del entries[member]
+            if len(entries) >= limit:
+                return 0
+            entries[request_id] = now
+            return 1
+        return run
+
+    async def zadd(self, key, mapping, xx=False):
+        await self._call()
+        entries = self.sets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not xx or member in entries:
+                entries[member] = score
+
+    async def expire(self, key, seconds):
+        await self._call()
+
+    async def zrem(self, key, member):
+        await self._call()
+        self.sets.get(key, {}).pop(member, None)
+
+
+class FakeBreaker:
+    def __init__(self):
+        self.open = False
+
+    def is_open(self):
+        return self.open
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    breaker = FakeBreaker()
+    monkeypatch.setattr(rate_limit.redis, "get_client_if_ready", lambda: client)
+    monkeypatch.setattr(rate_limit, "get_circuit_breaker", lambda: breaker)
+    monkeypatch.setattr(rate_limit, "_acquire_script", None)
+    monkeypatch.setattr(rate_limit, "_skip_until", 0.0)
+    monkeypatch.setattr(rate_limit, "_connect_task", None)
+    client.breaker = breaker
+    return client
+
+
+def _slots(client, key="1.2.3.4"):
+    return client.sets.get(rate_limit._KEY_PREFIX + key, {})
+
+
+async def test_acquire_until_limit(fake_redis):
+    slots = [await rate_limit.acquire("1.2.3.4", limit=2) for _ in range(2)]
+    assert all(slots)
+    assert await rate_limit.acquire("1.2.3.4", limit=2) == ""
+    # Other clients have their own budget
+    assert await rate_limit.acquire("5.6.7.8", limit=2)
+
+
+async def test_release_frees_slot(fake_redis):
+    slot = await rate_limit.acquire("1.2.3.4", limit=1)
+    assert await rate_limit.acquire("1.2.3.4", limit=1) == ""
+
+    await rate_limit.release("1.2.3.4", slot)
+
+    assert _slots(fake_redis) == {}
+    assert await rate_limit.acquire("1.2.3.4", limit=1)
+
+
+async def test_expired_slots_are_dropped(fake_redis, monkeypatch):
+    now = 1_000.0
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now)
+    assert await rate_limit.acquire("1.2.3.4", limit=1, window=60)
+
+    now += 61
+    assert await rate_limit.acquire("1.2.3.4", limit=1, window=60)
+
+
+async def test_refresh_keeps_slot_in_window(fake_redis, monkeypatch):
+    now = 1_000.0
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now)
+    slot = await rate_limit.acquire("1.2.3.4", limit=1, window=60)
+
+    now += 45
+    await rate_limit.refresh("1.2.3.4", slot)
+    now += 45
+    assert await rate_limit.acquire("1.2.3.4", limit=1, window=60) == ""
+
+
+async def test_refresh_does_not_resurrect_released_slot(fake_redis):
+    slot = await rate_limit.acquire("1.2.3.4")
+    await rate_limit.release("1.2.3.4", slot)
+
+    await rate_limit.refresh("1.2.3.4", slot)
+
+    assert _slots(fake_redis) == {}
+
+
+async def test_keep_alive_cancel_stops_refreshing(fake_redis, monkeypatch):
+    monkeypatch.setattr(rate_limit, "CONCURRENCY_WINDOW_SECONDS", 0.02)
+    refreshed = []
+
+    async def refresh(client, request_id):
+        refreshed.append(request_id)
+
+    monkeypatch.setattr(rate_limit, "refresh", refresh)
+    keep_alive = rate_limit.keep_alive("1.2.3.4", "slot")
+    await asyncio.sleep(0.035)
+    assert refreshed
+
+    keep_alive.cancel()
+    count = len(refreshed)
+    await asyncio.sleep(0.05)
+    assert len(refreshed) == count
+
+
+async def test_redis_error_fails_open_and_backs_off(fake_redis):
+    fake_redis.fail_with = ConnectionError("redis down")
+    assert await rate_limit.acquire("1.2.3.4") is None
+
+    # Recovered, but the limiter stays out of the way until the backoff ends
+    fake_redis.fail_with = None
+    assert await rate_limit.acquire("1.2.3.4") is None
+    assert _slots(fake_redis) == {}
+
+
+async def test_slow_redis_fails_open(fake_redis, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_REDIS_TIMEOUT", 0.01)
+    fake_redis.delay = 1.0
+
+    assert await asyncio.wait_for(rate_limit.acquire("1.2.3.4"), timeout=0.5) is None
+
+
+async def test_open_circuit_fails_open(fake_redis):
+    fake_redis.breaker.open = True
+
+    assert await rate_limit.acquire("1.2.3.4") is None
+    assert _slots(fake_redis) == {}
+
+
+async def test_unconnected_redis_fails_open_without_waiting(fake_redis, monkeypatch):
+    connecting = asyncio.Event()
+
+    async def get_client():
+        connecting.set()
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(rate_limit.redis, "get_client_if_ready", lambda: None)
+    monkeypatch.setattr(rate_limit.redis, "get_client", get_client)
+
+    assert await rate_limit.acquire("1.2.3.4") is None
+    await asyncio.wait_for(connecting.wait(), timeout=1)
+    await rate_limit._connect_task
+    assert rate_limit._skip_until > 0
+
+
+def _scope(headers=(), client=("10.0.0.1", 1234)):
+    return {"headers": list(headers), "client": client}
+
+
+def test_client_key_uses_forwarded_address(monkeypatch):
+    monkeypatch.setattr(rate_limit.config, "TRUSTED_PROXY_COUNT", 1)
+    scope = _scope([(b"x-forwarded-for", b"6.6.6.6, 1.2.3.4")])
+
+    assert rate_limit.client_key(scope) == "1.2.3.4"
+
+
+def test_client_key_without_forwarded_header(monkeypatch):
+    monkeypatch.setattr(rate_limit.config, "TRUSTED_PROXY_COUNT", 1)
+
+    assert rate_limit.client_key(_scope()) == "10.0.0.1"
+    assert rate_limit.client_key(_scope(client=None)) == "unknown"
+
+
+def test_client_key_ignores_forwarded_header_without_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit.config, "TRUSTED_PROXY_COUNT", 0)
+    scope = _scope([(b"x-forwarded-for", b"1.2.3.4")])
+
+    assert rate_limit.client_key(scope) == "10.0.0.1"
+
+
+def test_health_paths_are_exempt():
+    assert rate_limit.is_exempt("/api/health")
+    assert rate_limit.is_exempt("/api/health/redis")
+    assert not rate_limit.is_exempt("/api/agent/start")
+
+
+def test_forwarded_header_not_trusted_by_default():
+    scope = _scope([(b"x-forwarded-for", b"1.2.3.4")])
+
+    assert rate_limit.config.TRUSTED_PROXY_COUNT == 0
+    assert rate_limit.client_key(scope) == "10.0.0.1"
@@ -229,10 +229,18 @@ class Configuration:
     REDIS_PASSWORD: Optional[str] = None
     REDIS_SSL: bool = True
     
+    # Proxies in front of the API that append to X-Forwarded-For (e.g. 1
+    # behind a load balancer); 0 trusts no forwarding headers and identifies
+    # clients by the socket peer
+    TRUSTED_PROXY_COUNT: int = 0
+    
     # Daytona sandbox configuration
     DAYTONA_API_KEY: str
     DAYTONA_SERVER_URL: str
     DAYTONA_TARGET: str
+    # Idle sandboxes kept pre-created to hide creation latency, per API
+    # process (0 disables)
+    SANDBOX_WARM_POOL_SIZE: int = 0
     
     # Search and other API keys
     TAVILY_API_KEY: str
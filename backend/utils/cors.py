@@ -0,0 +1,122 @@
+from typing import Iterable
+
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.cors import SAFELISTED_HEADERS, CORSMiddleware
+
+
+class CachedCORSMiddleware(CORSMiddleware):
+    """
+    CORSMiddleware that encodes its static response headers once at startup.
+
+    Starlette re-encodes and re-inserts ``simple_headers`` through
+    ``MutableHeaders.update`` on every response, scanning the header list once
+    per key. Here the latin-1 byte pairs are built in ``__init__`` and appended
+    to the outgoing header list in a single pass. Allowed origins are held in a
+    frozenset so the exact-match check is O(1) and runs before the regex.
+    """
+
+    def __init__(self, app, **kwargs) -> None:
+        super().__init__(app, **kwargs)
+        self.allow_origins = frozenset(self.allow_origins)
+        self._simple_headers_raw = [
+            (key.lower().encode("latin-1"), value.encode("latin-1"))
+            for key, value in self.simple_headers.items()
+        ]
+        self._simple_header_keys = frozenset(key for key, _ in self._simple_headers_raw)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        # Exact matches are the common case; only fall back to the regex on a miss.
+        if self.allow_all_origins or origin in self.allow_origins:
+            return True
+        return self.allow_origin_regex is not None and self.allow_origin_regex.fullmatch(origin) is not None
+
+    async def send(self, message, send, request_headers) -> None:
+        if message["type"] != "http.response.start":
+            await send(message)
+            return
+
+        skip = self._simple_header_keys
+        raw = [item for item in message.get("headers", ()) if item[0] not in skip]
+        raw.extend(self._simple_headers_raw)
+        message["headers"] = raw
+
+        origin = request_headers["origin"]
+        if self.allow_all_origins:
+            # Credentialed requests must echo the explicit origin instead of '*'.
+            if "cookie" in request_headers:
+                self.allow_explicit_origin(MutableHeaders(raw=raw), origin)
+        elif self.is_allowed_origin(origin=origin):
+            self.allow_explicit_origin(MutableHeaders(raw=raw), origin)
+
+        await send(message)
+
+
+class FastPreflightMiddleware:
+    """
+    Answers valid CORS preflight requests before any other middleware runs.
+
+    Preflights from an exactly-allowed origin that request an allowed method
+    and allowed headers get a 204 built from pre-encoded headers. Anything
+    else (regex origins, disallowed methods/headers) falls through to the
+    regular CORS middleware, which produces the detailed 400 response.
+    """
+
+    def __init__(
+        self,
+        app,
+        allow_origins: Iterable[str] = (),
+        allow_methods: Iterable[str] = ("GET",),
+        allow_headers: Iterable[str] = (),
+        allow_credentials: bool = False,
+        max_age: int = 86400,
+    ) -> None:
+        self.app = app
+        self.allow_origins = frozenset(origin.encode("latin-1") for origin in allow_origins)
+        self.allow_methods = frozenset(method.encode("latin-1") for method in allow_methods)
+        allowed_headers = sorted(SAFELISTED_HEADERS | set(allow_headers))
+        self.allow_headers = frozenset(header.lower() for header in allowed_headers)
+
+        headers = [
+            (b"vary", b"Origin"),
+            (b"access-control-allow-methods", ", ".join(allow_methods).encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"access-control-allow-headers", ", ".join(allowed_headers).encode("latin-1")),
+        ]
+        if allow_credentials:
+            headers.append((b"access-control-allow-credentials", b"true"))
+        self._preflight_headers = headers
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] != "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        origin = requested_method = requested_headers = None
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                origin = value
+            elif key == b"access-control-request-method":
+                requested_method = value
+            elif key == b"access-control-request-headers":
+                requested_headers = value
+
+        if (
+            origin not in self.allow_origins
+            or requested_method not in self.allow_methods
+            or (requested_headers is not None and not self._headers_allowed(requested_headers))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 204,
+            "headers": [*self._preflight_headers, (b"access-control-allow-origin", origin)],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+    def _headers_allowed(self, requested_headers: bytes) -> bool:
+        return all(
+            header.strip() in self.allow_headers
+            for header in requested_headers.decode("latin-1").lower().split(",")
+        )